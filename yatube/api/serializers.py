@@ -0,0 +1,50 @@
+import json
+
+FIELDS = (
+    'id', 'text', 'pub_date', 'author', 'group', 'image', 'comments_count'
+)
+
+
+def parse_fields(value):
+    """Список полей из параметра `fields`; ValueError для неизвестных."""
+    if not value:
+        return FIELDS
+    fields = tuple(field for field in value.split(',') if field)
+    unknown = set(fields) - set(FIELDS)
+    if unknown:
+        raise ValueError(', '.join(sorted(unknown)))
+    return fields
+
+
+def serialize_post(post, fields=FIELDS):
+    getters = {
+        'id': lambda: post.id,
+        'text': lambda: post.text,
+        'pub_date': lambda: post.pub_date.isoformat(),
+        'author': lambda: post.author.username,
+        'group': lambda: post.group.slug if post.group_id else None,
+        'image': lambda: post.image.url if post.image else None,
+        'comments_count': lambda: post.comments_count,
+    }
+    return {field: getters[field]() for field in fields}
+
+
+def dumps(data):
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+def stream_page(page, fields=FIELDS):
+    """Отдавать страницу ленты кусками JSON по одному сообщению.
+
+    Курсоры известны заранее, поэтому идут перед списком, и ответ
+    не нужно собирать в памяти целиком.
+    """
+    yield (
+        f'{{"next":{dumps(page.next_cursor)},'
+        f'"previous":{dumps(page.previous_cursor)},"results":['
+    )
+    separator = ''
+    for post in page:
+        yield separator + dumps(serialize_post(post, fields))
+        separator = ','
+    yield ']}'
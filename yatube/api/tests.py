@@ -0,0 +1,188 @@
+import json
+from http import HTTPStatus
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from api.serializers import FIELDS
+from posts.models import Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        for i in range(settings.POSTS_LIMIT + 3):
+            Post.objects.create(
+                text=f'Сообщение {i}',
+                author=cls.author,
+                group=cls.group,
+            )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ApiFeedTests.reader)
+
+    def get_json(self, url, client=None, **params):
+        response = (client or self.client).get(url, params)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTrue(response.streaming)
+        return json.loads(b''.join(response.streaming_content))
+
+    def test_feeds(self):
+        urls = (
+            reverse('api:index'),
+            reverse('api:group_list', kwargs={'slug': 'test-slug'}),
+            reverse('api:profile', kwargs={'username': 'author'}),
+            reverse('api:follow_index'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                data = self.get_json(url, self.authorized_client)
+                self.assertEqual(len(data['results']), settings.POSTS_LIMIT)
+                self.assertEqual(set(data['results'][0]), set(FIELDS))
+                self.assertEqual(data['results'][0]['author'], 'author')
+                self.assertEqual(data['results'][0]['group'], 'test-slug')
+                self.assertIsNotNone(data['next'])
+                self.assertIsNone(data['previous'])
+
+    def test_cursor_pagination(self):
+        url = reverse('api:index')
+        first = self.get_json(url, limit=5)
+        second = self.get_json(url, limit=5, after=first['next'])
+        self.assertEqual(len(second['results']), 5)
+        self.assertLess(
+            second['results'][0]['id'], first['results'][-1]['id']
+        )
+        back = self.get_json(url, limit=5, before=second['previous'])
+        self.assertEqual(back['results'], first['results'])
+
+    def test_field_selection(self):
+        data = self.get_json(reverse('api:index'), fields='id,text')
+        self.assertEqual(set(data['results'][0]), {'id', 'text'})
+        response = self.client.get(reverse('api:index'), {'fields': 'email'})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    @override_settings(API_MAX_LIMIT=5)
+    def test_limit_is_capped(self):
+        data = self.get_json(reverse('api:index'), limit=10 ** 6)
+        self.assertEqual(len(data['results']), 5)
+
+    def test_etag(self):
+        url = reverse('api:index')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        Post.objects.create(text='Новое', author=ApiFeedTests.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_errors(self):
+        cases = (
+            (reverse('api:follow_index'), HTTPStatus.UNAUTHORIZED),
+            (
+                reverse('api:group_list', kwargs={'slug': 'missing'}),
+                HTTPStatus.NOT_FOUND
+            ),
+            (
+                reverse('api:profile', kwargs={'username': 'missing'}),
+                HTTPStatus.NOT_FOUND
+            ),
+        )
+        for url, status in cases:
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH='*')
+                self.assertEqual(response.status_code, status)
+                self.assertIn('detail', response.json())
+                self.assertFalse(response.has_header('ETag'))
+                self.assertFalse(response.has_header('Last-Modified'))
+                self.assertNotIn(
+                    'max-age', response.get('Cache-Control', '')
+                )
+
+    def test_bad_request_has_no_validators(self):
+        response = self.client.get(
+            reverse('api:index'), {'fields': 'missing'}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertFalse(response.has_header('ETag'))
+        self.assertNotIn('max-age', response.get('Cache-Control', ''))
+
+    def test_read_only(self):
+        response = self.authorized_client.post(reverse('api:index'))
+        self.assertEqual(response.status_code, HTTPStatus.METHOD_NOT_ALLOWED)
+
+
+class ApiExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.admin = User.objects.create_user(username='admin', is_staff=True)
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Сообщение, с запятой',
+            author=cls.author,
+            group=cls.group,
+        )
+        cls.post.comments.create(author=cls.other, text='Комментарий')
+
+    def get_export(self, user, url, **params):
+        client = Client()
+        client.force_login(user)
+        return client.get(url, params)
+
+    def test_export_jsonl(self):
+        url = reverse('api:export_profile', kwargs={'username': 'author'})
+        response = self.get_export(ApiExportTests.author, url)
+        self.assertTrue(response.streaming)
+        self.assertIn('author.jsonl', response['Content-Disposition'])
+        rows = [
+            json.loads(line) for line in
+            b''.join(response.streaming_content).decode().splitlines()
+        ]
+        self.assertEqual([row['type'] for row in rows], ['post', 'comment'])
+        self.assertEqual(rows[0]['text'], ApiExportTests.post.text)
+        self.assertEqual(rows[0]['group'], 'test-slug')
+        self.assertEqual(rows[1]['post'], ApiExportTests.post.id)
+
+    def test_export_csv(self):
+        url = reverse('api:export_group', kwargs={'slug': 'test-slug'})
+        response = self.get_export(ApiExportTests.admin, url, format='csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'id,text,author,group,pub_date,image')
+        self.assertIn('"Сообщение, с запятой",author,test-slug', lines[1])
+        self.assertEqual(len(lines), 2)
+
+    def test_export_permissions(self):
+        profile = reverse('api:export_profile', kwargs={'username': 'author'})
+        group = reverse('api:export_group', kwargs={'slug': 'test-slug'})
+        cases = (
+            (ApiExportTests.other, profile, HTTPStatus.FORBIDDEN),
+            (ApiExportTests.admin, profile, HTTPStatus.OK),
+            (ApiExportTests.author, group, HTTPStatus.FORBIDDEN),
+        )
+        for user, url, status in cases:
+            with self.subTest(user=user.username, url=url):
+                response = self.get_export(user, url)
+                self.assertEqual(response.status_code, status)
+        response = self.client.get(profile)
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
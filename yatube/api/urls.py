@@ -0,0 +1,18 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'api'
+
+urlpatterns = [
+    path('posts/', views.index, name='index'),
+    path('group/<slug:slug>/', views.group_posts, name='group_list'),
+    path('profile/<str:username>/', views.profile, name='profile'),
+    path('follow/', views.follow_index, name='follow_index'),
+    path(
+        'export/profile/<str:username>/',
+        views.export_profile,
+        name='export_profile'
+    ),
+    path('export/group/<slug:slug>/', views.export_group, name='export_group'),
+]
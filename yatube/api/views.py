@@ -0,0 +1,130 @@
+from http import HTTPStatus
+
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_safe
+
+from api.serializers import parse_fields, stream_page
+from core.paginator import CursorPaginator
+from posts import conditional, export
+from posts.models import Group, Post, User
+from posts.timeline import get_timeline
+
+
+def error(status, detail):
+    return JsonResponse({'detail': detail}, status=status)
+
+
+def get_limit(request):
+    try:
+        limit = int(request.GET.get('limit', settings.POSTS_LIMIT))
+    except ValueError:
+        limit = settings.POSTS_LIMIT
+    return min(max(limit, 1), settings.API_MAX_LIMIT)
+
+
+def export_response(request, filename, **filters):
+    row_format = request.GET.get('format', 'jsonl')
+    if row_format not in export.FORMATS:
+        return error(
+            HTTPStatus.BAD_REQUEST, f'Неизвестный формат {row_format}'
+        )
+    row_types = tuple(export.FIELDS)
+    if 'type' in request.GET or row_format == 'csv':
+        row_types = (request.GET.get('type', 'post'),)
+    if row_types[0] not in export.FIELDS:
+        return error(HTTPStatus.BAD_REQUEST, f'Неизвестный тип {row_types[0]}')
+    response = StreamingHttpResponse(
+        export.stream(row_format, row_types, **filters),
+        content_type=(
+            'text/csv; charset=utf-8' if row_format == 'csv'
+            else 'application/x-ndjson; charset=utf-8'
+        ),
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{filename}.{row_format}"'
+    )
+    return response
+
+
+def feed_response(request, post_list, field='pub_date', pk_field='pk'):
+    try:
+        fields = parse_fields(request.GET.get('fields'))
+    except ValueError as unknown:
+        return error(HTTPStatus.BAD_REQUEST, f'Неизвестные поля: {unknown}')
+    paginator = CursorPaginator(
+        post_list.select_related('author', 'group'),
+        get_limit(request),
+        field=field,
+        pk_field=pk_field,
+    )
+    page = paginator.get_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+    return StreamingHttpResponse(
+        stream_page(page, fields), content_type='application/json'
+    )
+
+
+@require_safe
+@conditional.conditional_page('api:index', conditional.index_scopes)
+def index(request):
+    return feed_response(request, Post.objects.all())
+
+
+@require_safe
+@conditional.conditional_page('api:group_list', conditional.group_scopes)
+def group_posts(request, slug):
+    group = Group.objects.filter(slug=slug).first()
+    if group is None:
+        return error(HTTPStatus.NOT_FOUND, 'Группа не найдена')
+    return feed_response(request, group.posts.all())
+
+
+@require_safe
+@conditional.conditional_page('api:profile', conditional.profile_scopes)
+def profile(request, username):
+    author = User.objects.filter(username=username).first()
+    if author is None:
+        return error(HTTPStatus.NOT_FOUND, 'Пользователь не найден')
+    return feed_response(request, author.posts.all())
+
+
+@require_safe
+@conditional.conditional_page('api:follow_index', conditional.follow_scopes)
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return error(HTTPStatus.UNAUTHORIZED, 'Нужно войти')
+    return feed_response(
+        request,
+        get_timeline(request.user),
+        field='feed_date',
+        pk_field='feed_post',
+    )
+
+
+@require_safe
+def export_profile(request, username):
+    if not request.user.is_authenticated:
+        return error(HTTPStatus.UNAUTHORIZED, 'Нужно войти')
+    author = User.objects.filter(username=username).first()
+    if author is None:
+        return error(HTTPStatus.NOT_FOUND, 'Пользователь не найден')
+    if author != request.user and not request.user.is_staff:
+        return error(
+            HTTPStatus.FORBIDDEN, 'Можно выгрузить только свои записи'
+        )
+    return export_response(request, username, author=author)
+
+
+@require_safe
+def export_group(request, slug):
+    if not request.user.is_authenticated:
+        return error(HTTPStatus.UNAUTHORIZED, 'Нужно войти')
+    if not request.user.is_staff:
+        return error(HTTPStatus.FORBIDDEN, 'Выгрузка групп доступна админам')
+    group = Group.objects.filter(slug=slug).first()
+    if group is None:
+        return error(HTTPStatus.NOT_FOUND, 'Группа не найдена')
+    return export_response(request, slug, group=group)
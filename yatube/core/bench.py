@@ -0,0 +1,8 @@
+import math
+
+
+def percentile(values, percent):
+    """Перцентиль по ближайшему рангу: значение из самой выборки."""
+    ordered = sorted(values)
+    index = max(math.ceil(percent / 100 * len(ordered)) - 1, 0)
+    return ordered[index]
@@ -0,0 +1,223 @@
+import itertools
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from core import metrics
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    'key TEXT PRIMARY KEY, value BLOB, expires REAL, accessed REAL)',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+)
+LIVE = '(expires IS NULL OR expires > ?)'
+# Метка последнего чтения обновляется не чаще раза в несколько секунд:
+# для вытеснения по LRU точнее не нужно, а get не становится записью.
+ACCESS_RESOLUTION = 5
+BUSY_TIMEOUT = 5
+# COUNT(*) проходит всю таблицу, поэтому размер проверяется не на каждой
+# записи, а раз в CULL_EVERY записей процесса.
+CULL_EVERY = 100
+INT_RANGE = range(-2 ** 63, 2 ** 63)
+
+
+def _encode(value):
+    # Целые хранятся как INTEGER, чтобы incr был одним UPDATE.
+    if type(value) is int and value in INT_RANGE:
+        return value
+    return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+def _decode(value):
+    if isinstance(value, bytes):
+        return pickle.loads(value)
+    return value
+
+
+class SQLiteCache(BaseCache):
+    """Кеш в файле SQLite, общий для всех процессов на одной машине.
+
+    LOCATION — путь к файлу. Размер ограничен OPTIONS['MAX_ENTRIES'] и
+    проверяется раз в OPTIONS['CULL_EVERY'] записей, так что между
+    проверками кеш может вырасти на столько же. При переполнении
+    удаляются просроченные записи, а затем 1/CULL_FREQUENCY давно
+    не читавшихся.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        self._local = threading.local()
+        options = params.get('OPTIONS', {})
+        self._cull_every = max(int(options.get('CULL_EVERY', CULL_EVERY)), 1)
+        self._writes = itertools.count(1)
+
+    @property
+    def _connection(self):
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(
+                self._path,
+                timeout=BUSY_TIMEOUT,
+                isolation_level=None,
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            local.connection = connection
+            local.pid = os.getpid()
+        return local.connection
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _expires(self, timeout):
+        return self.get_backend_timeout(timeout)
+
+    def _fetch(self, keys):
+        now = time.time()
+        placeholders = ', '.join('?' * len(keys))
+        rows = self._connection.execute(
+            f'SELECT key, value, accessed FROM cache '
+            f'WHERE key IN ({placeholders}) AND {LIVE}',
+            (*keys, now),
+        ).fetchall()
+        stale = [key for key, _, accessed in rows
+                 if now - accessed > ACCESS_RESOLUTION]
+        if stale:
+            self._connection.execute(
+                f'UPDATE cache SET accessed = ? '
+                f'WHERE key IN ({", ".join("?" * len(stale))})',
+                (now, *stale),
+            )
+        metrics.add('cache_hit', len(rows))
+        metrics.add('cache_miss', len(keys) - len(rows))
+        return {key: _decode(value) for key, value, _ in rows}
+
+    def _cull(self, connection, now):
+        if next(self._writes) % self._cull_every:
+            return
+        count, = connection.execute('SELECT COUNT(*) FROM cache').fetchone()
+        if count <= self._max_entries:
+            return
+        connection.execute('DELETE FROM cache WHERE expires <= ?', (now,))
+        count, = connection.execute('SELECT COUNT(*) FROM cache').fetchone()
+        if count <= self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            connection.execute('DELETE FROM cache')
+            return
+        connection.execute(
+            'DELETE FROM cache WHERE key IN '
+            '(SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+            (count // self._cull_frequency,),
+        )
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        return self._fetch([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        key_map = {self._key(key, version): key for key in keys}
+        if not key_map:
+            return {}
+        return {
+            key_map[key]: value
+            for key, value in self._fetch(list(key_map)).items()
+        }
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        row = self._connection.execute(
+            f'SELECT 1 FROM cache WHERE key = ? AND {LIVE}',
+            (key, time.time()),
+        ).fetchone()
+        return row is not None
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        expires = self._expires(timeout)
+        if expires is not None and expires <= now:
+            # Тайм-аут 0: значение не хранится, как в memcached.
+            self.delete_many(data, version)
+            return []
+        rows = [
+            (self._key(key, version), _encode(value), expires, now)
+            for key, value in data.items()
+        ]
+        connection = self._connection
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.executemany(
+                'INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)', rows
+            )
+            self._cull(connection, now)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        key = self._key(key, version)
+        connection = self._connection
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            added = connection.execute(
+                'INSERT INTO cache VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (key) DO UPDATE SET value = excluded.value, '
+                'expires = excluded.expires, accessed = excluded.accessed '
+                'WHERE cache.expires <= ?',
+                (key, _encode(value), self._expires(timeout), now, now),
+            ).rowcount
+            if added:
+                self._cull(connection, now)
+        return bool(added)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        return bool(self._connection.execute(
+            f'UPDATE cache SET expires = ? WHERE key = ? AND {LIVE}',
+            (self._expires(timeout), key, time.time()),
+        ).rowcount)
+
+    def incr(self, key, delta=1, version=None):
+        made_key = self._key(key, version)
+        connection = self._connection
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            row = connection.execute(
+                f'SELECT value FROM cache WHERE key = ? AND {LIVE}',
+                (made_key, time.time()),
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = _decode(row[0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                (_encode(value), made_key),
+            )
+        return value
+
+    def delete(self, key, version=None):
+        key = self._key(key, version)
+        return bool(self._connection.execute(
+            'DELETE FROM cache WHERE key = ?', (key,)
+        ).rowcount)
+
+    def delete_many(self, keys, version=None):
+        keys = [(self._key(key, version),) for key in keys]
+        connection = self._connection
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.executemany('DELETE FROM cache WHERE key = ?', keys)
+
+    def clear(self):
+        self._connection.execute('DELETE FROM cache')
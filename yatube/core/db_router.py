@@ -0,0 +1,50 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+
+PRIMARY = 'default'
+
+# Истина, пока обрабатывается запрос, которому можно читать с реплики.
+use_replica = ContextVar('use_replica', default=False)
+# Истина, если запрос уже писал в основную БД: после записи он читает
+# только из неё, а клиент получает метку ReplicaMiddleware.
+wrote = ContextVar('wrote', default=False)
+
+
+def reads_from_replica():
+    """Может ли текущий запрос читать с реплики.
+
+    Отстающая реплика отдаёт старые строки, а кеши лент хранят их под
+    текущей версией области до следующей записи. Поэтому то, что
+    попадёт в кеш, читается из основной БД или не кешируется.
+    """
+    return bool(
+        settings.DATABASE_REPLICAS and use_replica.get() and not wrote.get()
+    )
+
+
+class ReplicaRouter:
+    """Чтение с реплик DATABASE_REPLICAS для разрешённых запросов.
+
+    Разрешает ReplicaMiddleware: только GET к REPLICA_VIEWS без метки
+    недавней записи и до первой записи в самом запросе. Запись, миграции
+    и сессии всегда идут в основную БД.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not reads_from_replica() or model._meta.app_label == 'sessions':
+            return PRIMARY
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label != 'sessions':
+            wrote.set(True)
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *settings.DATABASE_REPLICAS}
+        return {obj1._state.db, obj2._state.db} <= databases
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
@@ -0,0 +1,218 @@
+import json
+import logging
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from urllib.parse import urljoin
+
+import requests
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.db import close_old_connections
+from django.urls import reverse
+
+# SQLite с общим кешем (in-memory БД тестов) сообщает о блокировке таблицы.
+LOCKED = ('database is locked', 'database table is locked')
+
+# Веса действий во встроенных сценариях. Свой сценарий — JSON-файл
+# с такими же ключами.
+SCENARIOS = {
+    'read': {
+        'index': 40, 'group_list': 15, 'profile': 15,
+        'post_detail': 25, 'follow_index': 5,
+    },
+    'mixed': {
+        'index': 30, 'group_list': 10, 'profile': 10,
+        'post_detail': 25, 'follow_index': 5,
+        'post_create': 5, 'add_comment': 15,
+    },
+    'write': {
+        'index': 20, 'post_detail': 10,
+        'post_create': 35, 'add_comment': 35,
+    },
+}
+
+
+def load_scenario(value):
+    if value in SCENARIOS:
+        return SCENARIOS[value]
+    with open(value) as file:
+        weights = json.load(file)
+    unknown = set(weights) - set(Worker.actions)
+    if unknown:
+        raise ValueError(', '.join(sorted(unknown)))
+    return weights
+
+
+def is_locked(text):
+    return any(message in text for message in LOCKED)
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class LockCounter(logging.Handler):
+    """Считает ошибки блокировки SQLite в логах django.request."""
+
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.count = 0
+
+    def emit(self, record):
+        if record.exc_info and is_locked(str(record.exc_info[1])):
+            self.count += 1
+
+
+class LocalServer:
+    """Многопоточный WSGI-сервер с приложением в фоновом потоке."""
+
+    def __init__(self, application, host='127.0.0.1', port=0):
+        self.server = ThreadedWSGIServer((host, port), QuietHandler)
+        self.server.set_app(application)
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, daemon=True
+        )
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+        close_old_connections()
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.timings = defaultdict(list)
+        self.errors = Counter()
+        self.locked = 0
+
+    def add(self, action, elapsed, error=False, locked=False):
+        with self.lock:
+            self.timings[action].append(elapsed)
+            self.errors[action] += error
+            self.locked += locked
+
+
+class Worker:
+    """Пользователь, который выполняет действия сценария по весам."""
+
+    actions = (
+        'index', 'group_list', 'profile', 'post_detail', 'follow_index',
+        'post_create', 'add_comment',
+    )
+
+    def __init__(self, base_url, credentials, targets, stats, seed):
+        self.base_url = base_url
+        self.credentials = credentials
+        self.targets = targets
+        self.stats = stats
+        self.random = random.Random(seed)
+        self.session = requests.Session()
+
+    def url(self, name, **kwargs):
+        return urljoin(self.base_url, reverse(name, kwargs=kwargs))
+
+    def login(self):
+        url = self.url('users:login')
+        self.session.get(url)
+        username, password = self.credentials
+        self.request('login', 'post', url, {
+            'username': username,
+            'password': password,
+        })
+
+    def request(self, action, method, url, data=None):
+        if data is not None:
+            data['csrfmiddlewaretoken'] = self.session.cookies.get(
+                'csrftoken'
+            )
+        started = time.perf_counter()
+        try:
+            response = self.session.request(
+                method, url, data=data, allow_redirects=False
+            )
+        except requests.RequestException:
+            self.stats.add(action, time.perf_counter() - started, error=True)
+            return
+        elapsed = time.perf_counter() - started
+        # Удачная отправка формы (вход, сообщение, комментарий)
+        # перенаправляет, а форма с ошибкой отдаётся заново с кодом 200.
+        # Без этой проверки при неудачном входе весь замер шёл бы от
+        # имени гостя и выглядел бы чистым.
+        error = response.status_code >= 400 or (
+            method == 'post' and not response.is_redirect
+        )
+        self.stats.add(
+            action, elapsed, error=error,
+            locked=response.status_code >= 500 and is_locked(response.text),
+        )
+
+    def run_action(self, action):
+        choice = self.random.choice
+        if action == 'index':
+            self.request(action, 'get', self.url('posts:index'))
+        elif action == 'group_list':
+            self.request(action, 'get', self.url(
+                'posts:group_list', slug=choice(self.targets['groups'])
+            ))
+        elif action == 'profile':
+            self.request(action, 'get', self.url(
+                'posts:profile', username=choice(self.targets['authors'])
+            ))
+        elif action == 'post_detail':
+            self.request(action, 'get', self.url(
+                'posts:post_detail', post_id=choice(self.targets['posts'])
+            ))
+        elif action == 'follow_index':
+            self.request(action, 'get', self.url('posts:follow_index'))
+        elif action == 'post_create':
+            self.request(action, 'post', self.url('posts:post_create'), {
+                'text': f'Нагрузочный тест {self.random.random()}',
+            })
+        elif action == 'add_comment':
+            self.request(action, 'post', self.url(
+                'posts:add_comment', post_id=choice(self.targets['posts'])
+            ), {'text': 'Нагрузочный комментарий'})
+
+    def run(self, weights, deadline):
+        self.login()
+        actions = list(weights)
+        cum_weights = []
+        total = 0
+        for action in actions:
+            total += weights[action]
+            cum_weights.append(total)
+        while time.monotonic() < deadline:
+            action, = self.random.choices(actions, cum_weights=cum_weights)
+            self.run_action(action)
+
+
+def run(base_url, weights, users, targets, duration, seed=1):
+    """Гонять сценарий `duration` секунд, по потоку на пользователя."""
+    stats = Stats()
+    deadline = time.monotonic() + duration
+    workers = [
+        Worker(base_url, credentials, targets, stats, seed + i)
+        for i, credentials in enumerate(users)
+    ]
+    threads = [
+        threading.Thread(target=worker.run, args=(weights, deadline))
+        for worker in workers
+    ]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return stats, time.monotonic() - started
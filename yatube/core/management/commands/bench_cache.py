@@ -0,0 +1,78 @@
+import os
+import tempfile
+import time
+from multiprocessing import Pool
+
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+BACKENDS = (
+    ('locmem', 'django.core.cache.backends.locmem.LocMemCache', None),
+    ('filebased', 'django.core.cache.backends.filebased.FileBasedCache',
+     'files'),
+    ('sqlite', 'core.cache.SQLiteCache', 'cache.sqlite3'),
+)
+OPERATIONS = ('set', 'get', 'incr')
+
+
+def make_cache(backend, location):
+    return import_string(backend)(location or 'bench', {
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    })
+
+
+def run(args):
+    backend, location, worker, operations = args
+    cache = make_cache(backend, location)
+    keys = [f'bench:{worker}:{i % 1000}' for i in range(operations)]
+    cache.add('bench:counter', 0)
+    timings = {}
+    started = time.perf_counter()
+    for key in keys:
+        cache.set(key, {'key': key, 'payload': 'x' * 100})
+    timings['set'] = time.perf_counter() - started
+    started = time.perf_counter()
+    for key in keys:
+        cache.get(key)
+    timings['get'] = time.perf_counter() - started
+    started = time.perf_counter()
+    for _ in keys:
+        cache.incr('bench:counter')
+    timings['incr'] = time.perf_counter() - started
+    return timings, cache.get('bench:counter')
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает кеш SQLite с LocMemCache и FileBasedCache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--operations', type=int, default=5000)
+        parser.add_argument('--processes', type=int, default=4)
+
+    def handle(self, *args, **options):
+        operations = options['operations']
+        processes = options['processes']
+        self.stdout.write(
+            f'{"backend":<10} {"op":<5} {"ops/s":>12} {"counter":>9}'
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            for name, backend, location in BACKENDS:
+                if location:
+                    location = os.path.join(directory, location)
+                with Pool(processes) as pool:
+                    results = pool.map(run, [
+                        (backend, location, worker, operations)
+                        for worker in range(processes)
+                    ])
+                # Для общего кеша счётчик равен числу всех incr,
+                # для LocMemCache у каждого процесса он свой.
+                counter = max(value for _, value in results)
+                for operation in OPERATIONS:
+                    elapsed = max(
+                        timings[operation] for timings, _ in results
+                    )
+                    rate = operations * processes / elapsed
+                    self.stdout.write(
+                        f'{name:<10} {operation:<5} {rate:>12.0f} '
+                        f'{counter:>9}'
+                    )
@@ -0,0 +1,183 @@
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from core.bench import percentile
+from core.sqlite import apply_pragmas
+from posts.models import Comment, Post, User
+
+# Настройки SQLite и Django по умолчанию: журнал отката, полная
+# синхронизация и новое соединение на каждый запрос. Режим журнала
+# хранится в файле, поэтому задаётся один раз при копировании.
+DEFAULTS = {'journal_mode': 'delete', 'synchronous': 'full'}
+MODES = ('default', 'tuned')
+
+
+def feed_sql():
+    queryset = Post.objects.select_related('author', 'group').order_by(
+        '-pub_date', '-pk'
+    )[:settings.POSTS_LIMIT]
+    sql, params = queryset.query.sql_with_params()
+    return sql.replace('%s', '?'), params
+
+
+def comment_sql():
+    table = Comment._meta.db_table
+    return (
+        f'INSERT INTO {table} (post_id, author_id, text, created) '
+        f'VALUES (?, ?, ?, ?)',
+        f'UPDATE {Post._meta.db_table} '
+        f'SET comments_count = comments_count + 1 WHERE id = ?',
+    )
+
+
+class Workload:
+    """Потоки читателей ленты и писателей комментариев на копии БД."""
+
+    def __init__(self, path, mode, post_ids, user_ids):
+        self.path = path
+        self.mode = mode
+        self.post_ids = post_ids
+        self.user_ids = user_ids
+        self.feed = feed_sql()
+        self.insert, self.update = comment_sql()
+        self.lock = threading.Lock()
+        self.timings = {'read': [], 'write': []}
+        self.errors = 0
+
+    def connect(self):
+        connection = sqlite3.connect(self.path, timeout=5)
+        if self.mode == 'tuned':
+            apply_pragmas(connection)
+        else:
+            apply_pragmas(connection, {
+                name: value for name, value in DEFAULTS.items()
+                if name != 'journal_mode'
+            })
+        return connection
+
+    def read(self, connection):
+        connection.execute(*self.feed).fetchall()
+
+    def write(self, connection, rng):
+        post_id = rng.choice(self.post_ids)
+        with connection:
+            connection.execute(self.insert, (
+                post_id, rng.choice(self.user_ids), 'Замер',
+                timezone.now().isoformat(' '),
+            ))
+            connection.execute(self.update, (post_id,))
+
+    def worker(self, kind, deadline, seed):
+        rng = random.Random(seed)
+        persistent = self.connect() if self.mode == 'tuned' else None
+        timings = []
+        errors = 0
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            connection = persistent
+            try:
+                connection = connection or self.connect()
+                if kind == 'read':
+                    self.read(connection)
+                else:
+                    self.write(connection, rng)
+            except sqlite3.OperationalError:
+                errors += 1
+            finally:
+                if persistent is None and connection is not None:
+                    connection.close()
+            timings.append(time.perf_counter() - started)
+        if persistent is not None:
+            persistent.close()
+        with self.lock:
+            self.timings[kind] += timings
+            self.errors += errors
+
+    def run(self, readers, writers, duration):
+        deadline = time.monotonic() + duration
+        threads = [
+            threading.Thread(
+                target=self.worker, args=(kind, deadline, number)
+            )
+            for number, kind in enumerate(
+                ['read'] * readers + ['write'] * writers
+            )
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        result = {'errors': self.errors}
+        for kind, timings in self.timings.items():
+            result[f'{kind}s_per_s'] = round(len(timings) / duration, 1)
+            result[f'{kind}_p95_ms'] = round(
+                percentile(timings, 95) * 1000, 2
+            ) if timings else None
+        return result
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность чтения ленты и записи '
+        'комментариев на копии БД: SQLite по умолчанию и SQLITE_PRAGMAS '
+        'с постоянными соединениями'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--duration', type=float, default=10)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--save', help='Записать результат в JSON')
+
+    def copy_database(self, path, journal_mode):
+        primary = connections['default']
+        primary.ensure_connection()
+        target = sqlite3.connect(path)
+        try:
+            primary.connection.backup(target)
+            target.execute(f'PRAGMA journal_mode = {journal_mode}')
+        finally:
+            target.close()
+
+    def handle(self, *args, **options):
+        if connections['default'].vendor != 'sqlite':
+            raise CommandError('Замер только для SQLite')
+        post_ids = list(Post.objects.values_list('id', flat=True)[:1000])
+        user_ids = list(User.objects.values_list('id', flat=True)[:1000])
+        if not post_ids:
+            raise CommandError('Нет данных: сначала запустите seed_bench')
+        results = {}
+        with tempfile.TemporaryDirectory() as directory:
+            for mode in MODES:
+                path = os.path.join(directory, f'{mode}.sqlite3')
+                self.copy_database(path, (
+                    settings.SQLITE_PRAGMAS if mode == 'tuned' else DEFAULTS
+                ).get('journal_mode', 'delete'))
+                results[mode] = Workload(path, mode, post_ids, user_ids).run(
+                    options['readers'], options['writers'],
+                    options['duration'],
+                )
+        self.stdout.write(
+            f'{"режим":<10}{"чтений/с":>12}{"p95 мс":>10}'
+            f'{"записей/с":>12}{"p95 мс":>10}{"ошибок":>10}'
+        )
+        for mode, result in results.items():
+            self.stdout.write(
+                f'{mode:<10}{result["reads_per_s"]:>12}'
+                f'{str(result["read_p95_ms"]):>10}'
+                f'{result["writes_per_s"]:>12}'
+                f'{str(result["write_p95_ms"]):>10}{result["errors"]:>10}'
+            )
+        if options['save']:
+            with open(options['save'], 'w') as file:
+                json.dump(results, file, indent=2, ensure_ascii=False)
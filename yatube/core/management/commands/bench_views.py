@@ -0,0 +1,156 @@
+import json
+import statistics
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.bench import percentile
+from posts.models import AuthorStats, Post, User
+
+METRICS = ('p50', 'p95', 'p99', 'queries', 'bytes')
+
+
+def pick_targets():
+    """Самые тяжёлые страницы: популярный автор, группа, читатель, пост."""
+    author = AuthorStats.objects.order_by('-followers_count').first()
+    reader = AuthorStats.objects.order_by('-following_count').first()
+    group = Post.objects.filter(group__isnull=False).values(
+        'group__slug'
+    ).annotate(total=Count('id')).order_by('-total').first()
+    post = Post.objects.order_by('-comments_count').first()
+    if author is None or post is None:
+        raise CommandError('Нет данных: сначала запустите seed_bench')
+    targets = {
+        'index': (None, reverse('posts:index')),
+        'index_page_50': (None, reverse('posts:index') + '?page=50'),
+        'profile': (None, reverse(
+            'posts:profile', kwargs={'username': author.user.username}
+        )),
+        'post_detail': (None, reverse(
+            'posts:post_detail', kwargs={'post_id': post.id}
+        )),
+    }
+    if group is not None:
+        targets['group_list'] = (None, reverse(
+            'posts:group_list', kwargs={'slug': group['group__slug']}
+        ))
+    if reader is not None:
+        targets['follow_index'] = (
+            User.objects.get(pk=reader.user_id), reverse('posts:follow_index')
+        )
+    return targets
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет задержку p50/p95/p99, число SQL-запросов и размер ответа '
+        'основных страниц и сравнивает с сохранённым результатом'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кеш перед каждым запросом',
+        )
+        parser.add_argument('--view', action='append', dest='views')
+        parser.add_argument('--save', help='Записать результат в JSON')
+        parser.add_argument('--baseline', help='JSON для сравнения')
+        parser.add_argument(
+            '--max-regression', type=float,
+            help='Ошибка, если p95 вырос больше чем на столько процентов',
+        )
+
+    def measure(self, client, url, options):
+        for _ in range(options['warmup']):
+            client.get(url)
+        timings = []
+        queries = []
+        size = 0
+        for _ in range(options['iterations']):
+            if options['cold']:
+                cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                response = client.get(url)
+                content = b''.join(response) if response.streaming else (
+                    response.content
+                )
+                timings.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                raise CommandError(f'{url}: ответ {response.status_code}')
+            queries.append(len(context))
+            size = len(content)
+        return {
+            'p50': round(percentile(timings, 50), 2),
+            'p95': round(percentile(timings, 95), 2),
+            'p99': round(percentile(timings, 99), 2),
+            'queries': statistics.median(queries),
+            'bytes': size,
+        }
+
+    def report(self, results, baseline):
+        self.stdout.write(
+            f'{"view":<15}{"p50 мс":>10}{"p95 мс":>10}{"p99 мс":>10}'
+            f'{"запросов":>10}{"байт":>10}'
+        )
+        regressions = {}
+        for name, result in results.items():
+            line = f'{name:<15}' + ''.join(
+                f'{result[metric]:>10}' for metric in METRICS
+            )
+            previous = baseline.get(name)
+            if previous:
+                deltas = []
+                for metric in ('p50', 'p95', 'queries'):
+                    if previous[metric]:
+                        change = (result[metric] / previous[metric] - 1) * 100
+                        deltas.append(f'{metric} {change:+.0f}%')
+                regressions[name] = (
+                    result['p95'] / previous['p95'] - 1
+                ) * 100 if previous['p95'] else 0
+                line += '   ' + ', '.join(deltas)
+            self.stdout.write(line)
+        return regressions
+
+    def handle(self, *args, **options):
+        targets = pick_targets()
+        if options['views']:
+            targets = {
+                name: target for name, target in targets.items()
+                if name in options['views']
+            }
+        results = {}
+        for name, (user, url) in targets.items():
+            client = Client()
+            if user is not None:
+                client.force_login(user)
+            results[name] = self.measure(client, url, options)
+        baseline = {}
+        if options['baseline']:
+            with open(options['baseline']) as file:
+                baseline = json.load(file)['views']
+        regressions = self.report(results, baseline)
+        if options['save']:
+            with open(options['save'], 'w') as file:
+                json.dump({
+                    'posts': Post.objects.count(),
+                    'cold': options['cold'],
+                    'views': results,
+                }, file, indent=2, ensure_ascii=False)
+        limit = options['max_regression']
+        worse = [
+            name for name, change in regressions.items()
+            if limit is not None and change > limit
+        ]
+        if worse:
+            raise CommandError(
+                f'p95 вырос больше чем на {limit}%: {", ".join(worse)}'
+            )
@@ -0,0 +1,152 @@
+import json
+import logging
+import secrets
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.bench import percentile
+from core.loadtest import (
+    SCENARIOS, LocalServer, LockCounter, load_scenario, run,
+)
+from posts.models import Group, Post, User
+
+
+def create_users(count, password):
+    """Временные пользователи для входа через форму; удаляются после замера.
+
+    Префикс имён случайный на каждый запуск, поэтому существующие
+    учётные записи не затрагиваются.
+    """
+    prefix = f'loadtest_{secrets.token_hex(4)}'
+    for i in range(count):
+        User.objects.create_user(username=f'{prefix}_{i}', password=password)
+    return prefix, [(f'{prefix}_{i}', password) for i in range(count)]
+
+
+def sample_targets(size):
+    posts = list(
+        Post.objects.order_by('-pub_date').values_list('id', flat=True)[:size]
+    )
+    if not posts:
+        raise CommandError('Нет сообщений: сначала запустите seed_bench')
+    return {
+        'posts': posts,
+        'authors': list(
+            User.objects.filter(posts__id__in=posts).values_list(
+                'username', flat=True
+            ).distinct()
+        ),
+        'groups': list(Group.objects.values_list('slug', flat=True)[:size]),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает yatube.wsgi.application параллельными читателями и '
+        'писателями; считает запросы в секунду, ошибки и блокировки SQLite'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--duration', type=float, default=30)
+        parser.add_argument(
+            '--concurrency', type=int, default=8,
+            help='Число одновременных пользователей',
+        )
+        parser.add_argument(
+            '--scenario', default='mixed',
+            help=f'{", ".join(SCENARIOS)} или путь к JSON с весами действий',
+        )
+        parser.add_argument(
+            '--url',
+            help='Адрес уже запущенного сервера вместо встроенного',
+        )
+        parser.add_argument(
+            '--create-users', action='store_true',
+            help='Создать в БД временных пользователей на время замера',
+        )
+        parser.add_argument(
+            '--password',
+            help='Пароль временных пользователей; по умолчанию случайный',
+        )
+        parser.add_argument('--sample', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--json', help='Записать результат в JSON')
+
+    def report(self, stats, elapsed, locked):
+        total = sum(len(timings) for timings in stats.timings.values())
+        errors = sum(stats.errors.values())
+        self.stdout.write(
+            f'{"action":<15}{"запросов":>10}{"ошибок":>10}'
+            f'{"p50 мс":>10}{"p95 мс":>10}'
+        )
+        actions = {}
+        for action, timings in sorted(stats.timings.items()):
+            actions[action] = {
+                'requests': len(timings),
+                'errors': stats.errors[action],
+                'p50': round(percentile(timings, 50) * 1000, 2),
+                'p95': round(percentile(timings, 95) * 1000, 2),
+            }
+            self.stdout.write(f'{action:<15}' + ''.join(
+                f'{value:>10}' for value in actions[action].values()
+            ))
+        result = {
+            'requests': total,
+            'rps': round(total / elapsed, 1) if elapsed else 0,
+            'error_rate': round(errors / total, 4) if total else 0,
+            'locked': locked,
+            'actions': actions,
+        }
+        self.stdout.write(
+            f'Запросов: {total} за {elapsed:.1f} с, '
+            f'{result["rps"]} в секунду; '
+            f'ошибок: {result["error_rate"]:.2%}; '
+            f'database is locked: {locked}'
+        )
+        return result
+
+    def handle(self, *args, **options):
+        try:
+            weights = load_scenario(options['scenario'])
+        except (OSError, ValueError) as error:
+            raise CommandError(f'Неверный сценарий: {error}')
+        if not options['create_users']:
+            raise CommandError(
+                'Замер входит на сайт временными пользователями: '
+                'подтвердите их создание флагом --create-users'
+            )
+        targets = sample_targets(options['sample'])
+        if not targets['groups']:
+            weights = {
+                action: weight for action, weight in weights.items()
+                if action != 'group_list'
+            }
+        counter = LockCounter()
+        logger = logging.getLogger('django.request')
+        logger.addHandler(counter)
+        prefix, users = create_users(
+            options['concurrency'],
+            options['password'] or secrets.token_urlsafe(16),
+        )
+        try:
+            if options['url']:
+                stats, elapsed = run(
+                    options['url'], weights, users, targets,
+                    options['duration'], options['seed'],
+                )
+            else:
+                from yatube.wsgi import application
+                with LocalServer(application) as server:
+                    stats, elapsed = run(
+                        server.url, weights, users, targets,
+                        options['duration'], options['seed'],
+                    )
+        finally:
+            logger.removeHandler(counter)
+            User.objects.filter(username__startswith=f'{prefix}_').delete()
+        # Во внешнем сервере логи недоступны: остаются только тела ответов.
+        locked = max(counter.count, stats.locked)
+        result = self.report(stats, elapsed, locked)
+        if options['json']:
+            with open(options['json'], 'w') as file:
+                json.dump(result, file, indent=2, ensure_ascii=False)
@@ -0,0 +1,177 @@
+import random
+import time
+from datetime import timedelta
+from itertools import accumulate, islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+
+from posts.importer import Importer, Touched, rebuild_derived
+from posts.models import Post
+
+SENTENCES = 500
+PERIOD = timedelta(days=365)
+
+
+def zipf_weights(size, alpha):
+    """Накопленные веса рангов 1..size по закону Ципфа для random.choices."""
+    return list(accumulate(1 / rank ** alpha for rank in range(1, size + 1)))
+
+
+class Generator:
+    """Детерминированный поток строк в формате posts.importer.
+
+    Популярность авторов, групп и сообщений подчиняется степенному закону:
+    немногие авторы пишут и собирают подписчиков больше всех остальных.
+    """
+
+    def __init__(self, seed, alpha):
+        self.random = random.Random(seed)
+        self.alpha = alpha
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(seed)
+        self.sentences = [
+            self.fake.sentence(nb_words=12) for _ in range(SENTENCES)
+        ]
+
+    def text(self):
+        return ' '.join(
+            self.random.choices(self.sentences, k=self.random.randint(1, 4))
+        )
+
+    def pick(self, population, weights, k=1):
+        return self.random.choices(population, cum_weights=weights, k=k)
+
+    def users(self, count):
+        for i in range(count):
+            yield {
+                'type': 'user',
+                'username': f'bench_{i}',
+                'first_name': self.fake.first_name(),
+                'last_name': self.fake.last_name(),
+            }
+
+    def groups(self, count):
+        for i in range(count):
+            yield {
+                'type': 'group',
+                'slug': f'bench-{i}',
+                'title': self.fake.catch_phrase()[:200],
+                'description': self.text(),
+            }
+
+    def posts(self, count, usernames, slugs, first_id):
+        authors = zipf_weights(len(usernames), self.alpha)
+        groups = zipf_weights(len(slugs), self.alpha) if slugs else None
+        started = timezone.now() - PERIOD
+        step = PERIOD / max(count, 1)
+        for i in range(count):
+            group = None
+            if groups and self.random.random() < 0.5:
+                group = self.pick(slugs, groups)[0]
+            yield {
+                'type': 'post',
+                'id': first_id + i,
+                'text': self.text(),
+                'author': self.pick(usernames, authors)[0],
+                'group': group,
+                'pub_date': started + step * i,
+            }
+
+    def comments(self, count, usernames, post_ids):
+        # Ранги сообщений перемешаны, чтобы популярные были не только новыми.
+        post_ids = list(post_ids)
+        self.random.shuffle(post_ids)
+        posts = zipf_weights(len(post_ids), self.alpha)
+        now = timezone.now()
+        for _ in range(count):
+            yield {
+                'type': 'comment',
+                'post': self.pick(post_ids, posts)[0],
+                'author': self.random.choice(usernames),
+                'text': self.text(),
+                'created': now - PERIOD * self.random.random(),
+            }
+
+    def follows(self, mean, usernames):
+        authors = zipf_weights(len(usernames), self.alpha)
+        # Среднее распределения Парето равно alpha / (alpha - 1).
+        scale = mean * (self.alpha - 1) / self.alpha
+        for username in usernames:
+            count = min(
+                len(usernames) - 1,
+                round(scale * self.random.paretovariate(self.alpha)),
+            )
+            following = set(self.pick(usernames, authors, k=count))
+            following.discard(username)
+            for author in sorted(following):
+                yield {'type': 'follow', 'user': username, 'author': author}
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет БД синтетическими пользователями, сообщениями, '
+        'комментариями и подписками для замеров производительности'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=100000)
+        parser.add_argument(
+            '--follows', type=float, default=20,
+            help='Среднее число подписок пользователя',
+        )
+        parser.add_argument(
+            '--alpha', type=float, default=1.2,
+            help='Показатель степенного распределения популярности',
+        )
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def rows(self, options):
+        generator = Generator(options['seed'], options['alpha'])
+        users = list(generator.users(options['users']))
+        groups = list(generator.groups(options['groups']))
+        usernames = [row['username'] for row in users]
+        slugs = [row['slug'] for row in groups]
+        first_id = (Post.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+        yield from users
+        yield from groups
+        yield from generator.posts(
+            options['posts'], usernames, slugs, first_id
+        )
+        if options['posts']:
+            yield from generator.comments(
+                options['comments'],
+                usernames,
+                range(first_id, first_id + options['posts']),
+            )
+        yield from generator.follows(options['follows'], usernames)
+
+    def handle(self, *args, **options):
+        if options['alpha'] <= 1:
+            raise CommandError('--alpha должен быть больше 1')
+        importer = Importer(options['batch_size'])
+        rows = self.rows(options)
+        total = 0
+        touched = Touched()
+        started = time.monotonic()
+        while True:
+            chunk = list(islice(rows, options['chunk_size']))
+            if not chunk:
+                break
+            touched.update(importer.import_chunk(chunk))
+            total += len(chunk)
+            rate = total / max(time.monotonic() - started, 1e-6)
+            self.stdout.write(f'Строк: {total}, {rate:.0f} строк/с')
+        self.stdout.write('Пересобираю ленты, счётчики и поисковый индекс')
+        rebuild_derived(touched)
+        self.stdout.write(
+            f'Готово строк: {total}, пропущено: {importer.skipped} '
+            f'за {time.monotonic() - started:.1f} с'
+        )
@@ -0,0 +1,227 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.template.backends import django as django_backend
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS metrics ('
+    'name TEXT, labels TEXT, value REAL, PRIMARY KEY (name, labels))'
+)
+BUSY_TIMEOUT = 5
+LABEL_RE = re.compile(r'(\w+)="([^"]*)"')
+
+# name: (тип, описание). Гистограммы хранятся рядами _bucket, _sum, _count.
+METRICS = {
+    'yatube_request_duration_seconds': (
+        'histogram', 'Время ответа по имени URL',
+    ),
+    'yatube_responses_total': ('counter', 'Ответы по имени URL и статусу'),
+    'yatube_db_queries_total': ('counter', 'SQL-запросы по имени URL'),
+    'yatube_db_query_seconds_total': (
+        'counter', 'Время SQL-запросов по имени URL',
+    ),
+    'yatube_template_render_seconds_total': (
+        'counter', 'Время отрисовки шаблонов по имени URL',
+    ),
+    'yatube_cache_requests_total': (
+        'counter', 'Чтения кеша по имени URL: попадания и промахи',
+    ),
+    'yatube_cache_hit_ratio': (
+        'gauge', 'Доля попаданий в кеш по имени URL',
+    ),
+}
+
+# Счётчики текущего запроса; вне запроса — None, и замеры не пишутся.
+current = ContextVar('metrics_current', default=None)
+
+
+def start():
+    state = defaultdict(float)
+    current.set(state)
+    return state
+
+
+def stop():
+    current.set(None)
+
+
+def add(key, value=1):
+    state = current.get()
+    if state is not None:
+        state[key] += value
+
+
+def _labels(labels):
+    return ','.join(
+        f'{key}="{value}"' for key, value in sorted(labels.items())
+    )
+
+
+class Registry:
+    """Накопитель метрик процесса со сбросом в общий файл SQLite.
+
+    Каждый процесс копит приращения в памяти и раз в
+    METRICS_FLUSH_INTERVAL секунд прибавляет их к строкам файла
+    METRICS_LOCATION, так что /metrics видит сумму по всем процессам.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._pid = os.getpid()
+        self._deltas = defaultdict(float)
+        self._flushed = time.monotonic()
+
+    @property
+    def _connection(self):
+        local = self._local
+        key = (os.getpid(), settings.METRICS_LOCATION)
+        if getattr(local, 'key', None) != key:
+            connection = sqlite3.connect(
+                settings.METRICS_LOCATION,
+                timeout=BUSY_TIMEOUT,
+                isolation_level=None,
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(SCHEMA)
+            local.connection = connection
+            local.key = key
+        return local.connection
+
+    def inc(self, name, labels, value=1):
+        with self._lock:
+            if self._pid != os.getpid():
+                # После fork приращения родителя сбросит сам родитель.
+                self._deltas.clear()
+                self._pid = os.getpid()
+            self._deltas[name, _labels(labels)] += value
+
+    def observe(self, name, labels, value):
+        buckets = settings.METRICS_BUCKETS
+        for bound in buckets[bisect_left(buckets, value):]:
+            self.inc(f'{name}_bucket', {**labels, 'le': bound})
+        self.inc(f'{name}_bucket', {**labels, 'le': '+Inf'})
+        self.inc(f'{name}_sum', labels, value)
+        self.inc(f'{name}_count', labels)
+
+    def flush(self, force=False):
+        now = time.monotonic()
+        with self._lock:
+            if not force and (
+                now - self._flushed < settings.METRICS_FLUSH_INTERVAL
+            ):
+                return
+            deltas, self._deltas = self._deltas, defaultdict(float)
+            self._flushed = now
+        if not deltas:
+            return
+        connection = self._connection
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.executemany(
+                'INSERT INTO metrics VALUES (?, ?, ?) '
+                'ON CONFLICT (name, labels) '
+                'DO UPDATE SET value = value + excluded.value',
+                [(name, labels, value)
+                 for (name, labels), value in deltas.items()],
+            )
+
+    def collect(self):
+        self.flush(force=True)
+        return self._connection.execute(
+            'SELECT name, labels, value FROM metrics ORDER BY name, labels'
+        ).fetchall()
+
+    def clear(self):
+        with self._lock:
+            self._deltas.clear()
+        self._connection.execute('DELETE FROM metrics')
+
+
+registry = Registry()
+
+
+def _base_name(name):
+    for suffix in ('_bucket', '_sum', '_count'):
+        if name.endswith(suffix) and name[:-len(suffix)] in METRICS:
+            return name[:-len(suffix)]
+    return name
+
+
+def _value(value):
+    return str(int(value)) if value == int(value) else repr(value)
+
+
+def _sort_key(row):
+    # Корзины гистограммы идут по возрастанию границы, +Inf — последней.
+    name, labels, _ = row
+    labels = dict(LABEL_RE.findall(labels))
+    bound = float(labels.pop('le', 'inf'))
+    return _base_name(name), name, sorted(labels.items()), bound
+
+
+def hit_ratios(rows):
+    totals = defaultdict(lambda: {'hit': 0, 'miss': 0})
+    for name, labels, value in rows:
+        if name == 'yatube_cache_requests_total':
+            labels = dict(LABEL_RE.findall(labels))
+            totals[labels['view']][labels['result']] += value
+    for view, counts in sorted(totals.items()):
+        total = counts['hit'] + counts['miss']
+        if total:
+            yield (
+                'yatube_cache_hit_ratio', _labels({'view': view}),
+                counts['hit'] / total,
+            )
+
+
+def render():
+    """Метрики всех процессов в текстовом формате Prometheus."""
+    rows = registry.collect()
+    rows += list(hit_ratios(rows))
+    lines = []
+    described = set()
+    for name, labels, value in sorted(rows, key=_sort_key):
+        base = _base_name(name)
+        if base not in described and base in METRICS:
+            kind, description = METRICS[base]
+            lines.append(f'# HELP {base} {description}')
+            lines.append(f'# TYPE {base} {kind}')
+            described.add(base)
+        series = f'{name}{{{labels}}}' if labels else name
+        lines.append(f'{series} {_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+class Template(django_backend.Template):
+
+    def render(self, context=None, request=None):
+        state = current.get()
+        # Вложенные render_to_string уже входят во время внешнего.
+        if state is None or state['template_depth']:
+            return super().render(context, request)
+        state['template_depth'] += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            state['template_seconds'] += time.perf_counter() - started
+            state['template_depth'] -= 1
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """Шаблонизатор Django, который замеряет время отрисовки."""
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return Template(template.template, self)
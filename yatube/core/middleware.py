@@ -0,0 +1,128 @@
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from core import metrics, profiler
+from core.db_router import use_replica, wrote
+
+PIN_COOKIE = 'pin_primary'
+
+
+class MetricsMiddleware:
+    """Замеряет каждый запрос и копит метрики по имени URL.
+
+    Ставится первым в MIDDLEWARE, чтобы время ответа включало
+    остальные слои. Время потоковых ответов считается до первого байта.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def count_queries(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            metrics.add('query_seconds', time.perf_counter() - started)
+            metrics.add('queries')
+
+    def __call__(self, request):
+        state = metrics.start()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(self.count_queries)
+                    )
+                response = self.get_response(request)
+        finally:
+            metrics.stop()
+        elapsed = time.perf_counter() - started
+        match = request.resolver_match
+        labels = {'view': match.view_name if match else 'unresolved'}
+        registry = metrics.registry
+        registry.observe('yatube_request_duration_seconds', labels, elapsed)
+        registry.inc(
+            'yatube_responses_total',
+            {**labels, 'status': response.status_code},
+        )
+        registry.inc('yatube_db_queries_total', labels, state['queries'])
+        registry.inc(
+            'yatube_db_query_seconds_total', labels, state['query_seconds']
+        )
+        registry.inc(
+            'yatube_template_render_seconds_total',
+            labels, state['template_seconds'],
+        )
+        for result in ('hit', 'miss'):
+            registry.inc(
+                'yatube_cache_requests_total',
+                {**labels, 'result': result}, state[f'cache_{result}'],
+            )
+        registry.flush()
+        return response
+
+
+class ProfilerMiddleware:
+    """Профилирует запрос сотрудника с ?profile или заголовком X-Profile.
+
+    Ставится после AuthenticationMiddleware. Без параметра стоимость —
+    одна проверка словаря; имя сохранённого профиля возвращается
+    в заголовке X-Profile.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not profiler.requested(request) or not request.user.is_staff:
+            return self.get_response(request)
+        response, name = profiler.profile(request, self.get_response)
+        response['X-Profile'] = name
+        return response
+
+
+class ReplicaMiddleware:
+    """Отправляет чтение GET-страниц из REPLICA_VIEWS на реплики.
+
+    После запроса с записью (не GET/HEAD/OPTIONS/TRACE или любого, для
+    которого роутер выбирал БД на запись, как GET profile_follow) клиент
+    получает cookie и REPLICA_PIN_SECONDS читает только из основной БД,
+    чтобы увидеть свою запись после редиректа, пока реплика отстаёт.
+    Запрос с атрибутом primary_only (страница, которая ляжет в кеш
+    страниц) тоже читает из основной БД.
+    """
+
+    safe_methods = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = use_replica.set(False)
+        wrote_token = wrote.set(False)
+        try:
+            response = self.get_response(request)
+            written = wrote.get()
+        finally:
+            use_replica.reset(token)
+            wrote.reset(wrote_token)
+        if settings.DATABASE_REPLICAS and (
+            written or request.method not in self.safe_methods
+        ):
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        use_replica.set(
+            request.method in ('GET', 'HEAD')
+            and request.resolver_match.view_name in settings.REPLICA_VIEWS
+            and PIN_COOKIE not in request.COOKIES
+            and not getattr(request, 'primary_only', False)
+        )
@@ -0,0 +1,108 @@
+import base64
+import binascii
+
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+def encode_cursor(value, pk):
+    if hasattr(value, 'isoformat'):
+        value = value.isoformat()
+    raw = f'{value!s},{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, parse=parse_datetime):
+    """Вернуть пару (значение, pk) из токена или None для битого токена."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        value, pk = raw.decode().rsplit(',', 1)
+        value = parse(value)
+        pk = int(pk)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        return None
+    if value is None:
+        return None
+    return value, pk
+
+
+class CursorPaginator(Paginator):
+    """Постраничный вывод по ключу (field, pk) без COUNT и OFFSET.
+
+    Лента упорядочена от новых записей к старым, при равных значениях
+    `field` — по убыванию `pk_field`. Страница после курсора
+    `after` содержит более старые записи, перед курсором `before` —
+    более новые. Параметр `number` оставлен для старых ссылок `?page=N`.
+    Число записей и страниц не считается: count, num_pages и page_range
+    бросают NotImplementedError вместо скрытого COUNT(*).
+    """
+
+    def __init__(self, object_list, per_page, field='pub_date',
+                 pk_field='pk', **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.field = field
+        self.pk_field = pk_field
+
+    @property
+    def count(self):
+        raise NotImplementedError('CursorPaginator не считает записи')
+
+    num_pages = page_range = count
+
+    def _seek(self, cursor, lookup):
+        value, pk = cursor
+        return (
+            Q(**{f'{self.field}__{lookup}': value})
+            | Q(**{self.field: value, f'{self.pk_field}__{lookup}': pk})
+        )
+
+    def _cursor(self, obj):
+        return encode_cursor(
+            getattr(obj, self.field), getattr(obj, self.pk_field)
+        )
+
+    def _page_number(self, number):
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            return 1
+        return max(number, 1)
+
+    def get_page(self, after=None, before=None, number=None):
+        after = decode_cursor(after)
+        before = decode_cursor(before)
+        limit = self.per_page + 1
+        if before is not None:
+            rows = list(
+                self.object_list
+                .filter(self._seek(before, 'gt'))
+                .order_by(self.field, self.pk_field)[:limit]
+            )
+            has_newer = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            has_older = bool(rows)
+            number = None
+        else:
+            queryset = self.object_list.order_by(
+                f'-{self.field}', f'-{self.pk_field}'
+            )
+            if after is not None:
+                rows = list(queryset.filter(self._seek(after, 'lt'))[:limit])
+                has_newer = True
+                number = None
+            else:
+                number = self._page_number(number)
+                offset = (number - 1) * self.per_page
+                rows = list(queryset[offset:offset + limit])
+                has_newer = number > 1
+            has_older = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+        page = self._get_page(rows, number, self)
+        page.next_cursor = self._cursor(rows[-1]) if has_older else None
+        page.previous_cursor = (
+            self._cursor(rows[0]) if has_newer and rows else None
+        )
+        return page
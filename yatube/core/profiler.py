@@ -0,0 +1,118 @@
+import cProfile
+import io
+import os
+import pstats
+import time
+import traceback
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+PROFILE_PARAM = 'profile'
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+STACK_DEPTH = 3
+
+
+def requested(request):
+    return PROFILE_PARAM in request.GET or PROFILE_HEADER in request.META
+
+
+def origin(stack):
+    """Последние кадры кода проекта, из которых выполнен SQL-запрос."""
+    frames = [
+        frame for frame in stack
+        if frame.filename.startswith(settings.BASE_DIR)
+        and frame.filename != __file__
+    ]
+    return [
+        f'{os.path.relpath(frame.filename, settings.BASE_DIR)}:'
+        f'{frame.lineno} in {frame.name}'
+        for frame in frames[-STACK_DEPTH:]
+    ]
+
+
+class QueryLog:
+    """Текст, время и место вызова SQL-запросов.
+
+    Параметры не сохраняются: в них ключи сессий, хеши паролей и адреса
+    почты, а профили лежат на диске.
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'ms': (time.perf_counter() - started) * 1000,
+                'origin': origin(traceback.extract_stack()),
+            })
+
+    def duplicates(self):
+        counts = Counter(query['sql'] for query in self.queries)
+        return [(sql, count) for sql, count in counts.most_common()
+                if count > 1]
+
+
+def rotate(directory, keep):
+    """Оставить файлы `keep` последних профилей, остальные удалить."""
+    names = sorted(
+        {name.rsplit('.', 1)[0] for name in os.listdir(directory)}
+    )
+    for name in names[:-keep] if keep else names:
+        for extension in ('prof', 'html'):
+            # Параллельный запрос мог удалить файл раньше.
+            try:
+                os.remove(os.path.join(directory, f'{name}.{extension}'))
+            except FileNotFoundError:
+                pass
+
+
+def profile(request, get_response):
+    """Выполнить запрос под cProfile и сохранить .prof и сводку .html.
+
+    Возвращает ответ и имя профиля без расширения.
+    """
+    log = QueryLog()
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(log))
+        response = profiler.runcall(get_response, request)
+    elapsed = (time.perf_counter() - started) * 1000
+    match = request.resolver_match
+    view = match.view_name if match else 'unresolved'
+    name = (
+        f'{timezone.now():%Y%m%d-%H%M%S-%f}-'
+        f'{view.replace(":", "-")}'
+    )
+    directory = settings.PROFILE_DIR
+    os.makedirs(directory, exist_ok=True)
+    profiler.dump_stats(os.path.join(directory, f'{name}.prof'))
+    output = io.StringIO()
+    pstats.Stats(profiler, stream=output).sort_stats(
+        'cumulative'
+    ).print_stats(settings.PROFILE_TOP)
+    summary = render_to_string('core/profile.html', {
+        'path': request.get_full_path(),
+        'view': view,
+        'status': response.status_code,
+        'elapsed': elapsed,
+        'queries': log.queries,
+        'queries_ms': sum(query['ms'] for query in log.queries),
+        'duplicates': log.duplicates(),
+        'stats': output.getvalue(),
+    })
+    with open(os.path.join(directory, f'{name}.html'), 'w') as file:
+        file.write(summary)
+    rotate(directory, settings.PROFILE_KEEP)
+    return response, name
@@ -0,0 +1,10 @@
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from core.sqlite import apply_pragmas
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        apply_pragmas(connection.connection)
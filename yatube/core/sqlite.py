@@ -0,0 +1,20 @@
+from django.conf import settings
+
+# journal_mode первым: остальные настройки не зависят от режима журнала.
+ORDER = ('journal_mode',)
+
+
+def pragma_statements(pragmas=None):
+    pragmas = settings.SQLITE_PRAGMAS if pragmas is None else pragmas
+    names = sorted(pragmas, key=lambda name: name not in ORDER)
+    return [f'PRAGMA {name} = {pragmas[name]}' for name in names]
+
+
+def apply_pragmas(connection, pragmas=None):
+    """Выполнить PRAGMA из SQLITE_PRAGMAS на DB-API соединении SQLite."""
+    cursor = connection.cursor()
+    try:
+        for statement in pragma_statements(pragmas):
+            cursor.execute(statement)
+    finally:
+        cursor.close()
@@ -1,4 +1,29 @@
-﻿from django.test import TestCase
+﻿import json
+import os
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.contrib.sessions.models import Session
+from django.db import connection, router
+from django.http import HttpResponse
+from django.test import (
+    LiveServerTestCase, RequestFactory, TestCase, TransactionTestCase,
+    override_settings,
+)
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from core import loadtest, metrics, profiler
+from core.cache import SQLiteCache
+from core.middleware import PIN_COOKIE, ReplicaMiddleware
+from core.paginator import CursorPaginator, decode_cursor, encode_cursor
+from posts import feed_cache
+from posts.models import (
+    AuthorStats, Comment, Follow, Post, TimelineEntry, User,
+)
 
 
 class ViewTestClass(TestCase):
@@ -7,3 +32,403 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, 404)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class CursorTestClass(TestCase):
+
+    def test_cursor_roundtrip(self):
+        value = timezone.now()
+        self.assertEqual(decode_cursor(encode_cursor(value, 42)), (value, 42))
+
+    def test_broken_cursor(self):
+        for token in ('', 'broken', encode_cursor(timezone.now(), 1)[:-3]):
+            with self.subTest(token=token):
+                self.assertIsNone(decode_cursor(token))
+
+    def test_paginator_never_counts(self):
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        with self.assertNumQueries(1):
+            paginator.get_page()
+        for name in ('count', 'num_pages', 'page_range'):
+            with self.subTest(name=name):
+                with self.assertRaises(NotImplementedError):
+                    getattr(paginator, name)
+
+
+class SQLiteCacheTestClass(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.location = os.path.join(self.directory.name, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.location, {
+            'OPTIONS': {
+                'MAX_ENTRIES': 4, 'CULL_FREQUENCY': 2, 'CULL_EVERY': 1,
+            },
+        })
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_zero_timeout_is_not_stored(self):
+        self.cache.set('post', 'старое')
+        self.cache.set('post', 'новое', 0)
+        self.assertIsNone(self.cache.get('post'))
+
+    def test_values_are_shared_between_instances(self):
+        self.cache.set('post', {'text': 'Тест'})
+        other = SQLiteCache(self.location, {})
+        self.assertEqual(other.get('post'), {'text': 'Тест'})
+        other.delete('post')
+        self.assertIsNone(self.cache.get('post'))
+
+    def test_add_and_incr(self):
+        self.assertTrue(self.cache.add('counter', 1))
+        self.assertFalse(self.cache.add('counter', 5))
+        self.assertEqual(self.cache.incr('counter', 2), 3)
+        self.assertEqual(self.cache.decr('counter'), 2)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_expired_values(self):
+        self.cache.set('expired', 1, timeout=0)
+        self.assertIsNone(self.cache.get('expired'))
+        self.assertTrue(self.cache.add('expired', 2))
+        self.assertEqual(self.cache.get('expired'), 2)
+
+    def test_size_is_bounded(self):
+        for i in range(10):
+            self.cache.set(f'key_{i}', i)
+        self.assertLessEqual(
+            len(self.cache.get_many([f'key_{i}' for i in range(10)])), 4
+        )
+        self.assertEqual(self.cache.get('key_9'), 9)
+
+    def test_size_is_checked_every_few_writes(self):
+        cache = SQLiteCache(self.location, {
+            'OPTIONS': {'MAX_ENTRIES': 2, 'CULL_EVERY': 5},
+        })
+        keys = [f'key_{i}' for i in range(5)]
+        for key in keys[:4]:
+            cache.set(key, 1)
+        self.assertEqual(len(cache.get_many(keys)), 4)
+        cache.set(keys[4], 1)
+        self.assertLess(len(cache.get_many(keys)), 5)
+
+
+class SQLitePragmasTestClass(TestCase):
+
+    def test_pragmas_applied(self):
+        with connection.cursor() as cursor:
+            for name, value in (
+                ('synchronous', 1), ('busy_timeout', 5000),
+                ('temp_store', 2), ('cache_size', -64000),
+            ):
+                cursor.execute(f'PRAGMA {name}')
+                self.assertEqual(cursor.fetchone()[0], value, name)
+
+
+class BenchTestClass(TestCase):
+    SIZES = {'users': 20, 'groups': 3, 'posts': 60, 'comments': 40}
+
+    def seed(self, **options):
+        call_command('seed_bench', stdout=StringIO(), **self.SIZES, **options)
+
+    def test_seed_bench(self):
+        self.seed(follows=3)
+        self.assertEqual(Post.objects.count(), 60)
+        self.assertEqual(Comment.objects.count(), 40)
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(TimelineEntry.objects.exists())
+        self.assertEqual(
+            sum(Post.objects.values_list('comments_count', flat=True)), 40
+        )
+        top = AuthorStats.objects.order_by('-posts_count').first()
+        self.assertGreater(top.posts_count, 60 / 20)
+
+    def test_seed_bench_is_deterministic(self):
+        self.seed(seed=7)
+        first = list(Post.objects.order_by('id').values_list(
+            'text', 'author__username'
+        ))
+        Post.objects.all().delete()
+        self.seed(seed=7)
+        second = list(Post.objects.order_by('id').values_list(
+            'text', 'author__username'
+        ))
+        self.assertEqual(first, second)
+
+    def test_bench_views_baseline(self):
+        self.seed()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'baseline.json')
+            call_command(
+                'bench_views', iterations=2, warmup=0, save=path,
+                stdout=StringIO()
+            )
+            with open(path) as file:
+                baseline = json.load(file)
+            self.assertEqual(
+                set(baseline['views']['index']),
+                {'p50', 'p95', 'p99', 'queries', 'bytes'}
+            )
+            out = StringIO()
+            call_command(
+                'bench_views', iterations=2, warmup=0, baseline=path,
+                view=['index'], stdout=out
+            )
+        self.assertIn('p95', out.getvalue())
+        self.assertNotIn('profile', out.getvalue())
+
+
+class SQLiteBenchTestClass(TransactionTestCase):
+    """Копия БД через backup API ждёт конца транзакции, TestCase не годится."""
+
+    def test_bench_sqlite(self):
+        call_command(
+            'seed_bench', stdout=StringIO(), **BenchTestClass.SIZES
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'sqlite.json')
+            call_command(
+                'bench_sqlite', duration=0.3, readers=1, writers=1,
+                save=path, stdout=StringIO()
+            )
+            with open(path) as file:
+                result = json.load(file)
+        self.assertEqual(set(result), {'default', 'tuned'})
+        self.assertGreater(result['tuned']['reads_per_s'], 0)
+        self.assertGreater(result['tuned']['writes_per_s'], 0)
+
+
+class LoadTestTestClass(LiveServerTestCase):
+
+    def test_loadtest_mixed(self):
+        call_command(
+            'seed_bench', users=5, groups=2, posts=20, comments=10,
+            stdout=StringIO()
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'load.json')
+            call_command(
+                'loadtest', url=self.live_server_url, duration=1,
+                concurrency=2, scenario='mixed', json=path,
+                create_users=True, stdout=StringIO()
+            )
+            with open(path) as file:
+                result = json.load(file)
+        self.assertFalse(
+            User.objects.filter(username__startswith='loadtest_').exists()
+        )
+        self.assertGreater(result['requests'], 0)
+        self.assertGreater(result['rps'], 0)
+        self.assertEqual(
+            set(result['actions']['index']),
+            {'requests', 'errors', 'p50', 'p95'}
+        )
+        self.assertEqual(result['actions']['login']['requests'], 2)
+        self.assertEqual(result['actions']['login']['errors'], 0)
+
+    def test_failed_login_is_an_error(self):
+        User.objects.create_user(username='reader', password='secret')
+        stats = loadtest.Stats()
+        worker = loadtest.Worker(
+            self.live_server_url, ('reader', 'wrong'), {}, stats, seed=1
+        )
+        worker.login()
+        self.assertEqual(stats.errors['login'], 1)
+
+    def test_loadtest_unknown_action(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as scenario:
+            json.dump({'index': 1, 'delete_everything': 1}, scenario)
+            scenario.flush()
+            with self.assertRaises(CommandError):
+                call_command('loadtest', scenario=scenario.name)
+
+    def test_loadtest_requires_opt_in(self):
+        with self.assertRaises(CommandError):
+            call_command('loadtest', duration=1, stdout=StringIO())
+
+
+class MetricsTestClass(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        settings = override_settings(
+            METRICS_LOCATION=os.path.join(self.directory.name, 'm.sqlite3'),
+            METRICS_FLUSH_INTERVAL=0,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.addCleanup(self.directory.cleanup)
+        metrics.registry.clear()
+        self.staff = User.objects.create_user(username='staff', is_staff=True)
+        self.user = User.objects.create_user(username='user')
+
+    def test_metrics_staff_only(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+
+    def test_metrics_per_view(self):
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode()
+        self.assertIn('# TYPE yatube_request_duration_seconds histogram', text)
+        self.assertIn(
+            'yatube_request_duration_seconds_count{view="posts:index"} 2',
+            text
+        )
+        self.assertIn(
+            'yatube_request_duration_seconds_bucket'
+            '{le="+Inf",view="posts:index"} 2',
+            text
+        )
+        self.assertIn('yatube_db_queries_total{view="posts:index"}', text)
+        self.assertIn(
+            'yatube_template_render_seconds_total{view="posts:index"}', text
+        )
+        self.assertIn(
+            'yatube_cache_requests_total{result="hit",view="posts:index"}',
+            text
+        )
+        self.assertIn('yatube_cache_hit_ratio{view="posts:index"}', text)
+
+    def test_metrics_summed_across_flushes(self):
+        metrics.registry.inc('yatube_responses_total', {'view': 'a'})
+        metrics.registry.flush(force=True)
+        metrics.registry.inc('yatube_responses_total', {'view': 'a'}, 2)
+        self.assertIn(
+            'yatube_responses_total{view="a"} 3', metrics.render()
+        )
+
+
+class ProfilerTestClass(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        settings = override_settings(
+            PROFILE_DIR=self.directory.name, PROFILE_KEEP=2
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.addCleanup(self.directory.cleanup)
+        self.staff = User.objects.create_user(username='staff', is_staff=True)
+
+    def test_profile_staff_request(self):
+        author = User.objects.create_user(username='author')
+        Post.objects.create(author=author, text='Профиль')
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('posts:index'), {'profile': 1})
+        self.assertEqual(response.status_code, 200)
+        name = response['X-Profile']
+        self.assertEqual(
+            sorted(os.listdir(self.directory.name)),
+            [f'{name}.html', f'{name}.prof']
+        )
+        with open(os.path.join(self.directory.name, f'{name}.html')) as file:
+            summary = file.read()
+        self.assertIn('posts/views.py', summary)
+        self.assertIn('SELECT', summary)
+
+    def test_query_params_are_not_logged(self):
+        log = profiler.QueryLog()
+        log(lambda *args: None, 'SELECT %s', ('секрет',), False, {})
+        self.assertEqual(log.queries[0]['sql'], 'SELECT %s')
+        self.assertNotIn('секрет', str(log.queries))
+
+    def test_profile_by_header_rotates(self):
+        self.client.force_login(self.staff)
+        for _ in range(3):
+            self.client.get(reverse('posts:index'), HTTP_X_PROFILE='1')
+        self.assertEqual(len(os.listdir(self.directory.name)), 4)
+
+    def test_no_profile_for_guests_and_users(self):
+        self.client.get(reverse('posts:index'), {'profile': 1})
+        self.client.force_login(User.objects.create_user(username='user'))
+        response = self.client.get(reverse('posts:index'), {'profile': 1})
+        self.assertFalse(response.has_header('X-Profile'))
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTestClass(TestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.middleware = ReplicaMiddleware(self.route)
+
+    def route(self, request):
+        # Как обработчик Django: process_view вызывается внутри цепочки.
+        request.resolver_match = resolve(request.path)
+        self.middleware.process_view(
+            request, request.resolver_match.func, (), {}
+        )
+        response = HttpResponse()
+        response.databases = (
+            router.db_for_read(Post), router.db_for_read(Session)
+        )
+        response.feed_cache_timeout = feed_cache.feed_cache_context(
+            request
+        )['feed_cache_timeout']
+        return response
+
+    def request(self, method, url, primary_only=False, **extra):
+        request = getattr(self.factory, method)(url, **extra)
+        if primary_only:
+            request.primary_only = True
+        return self.middleware(request)
+
+    def test_get_feed_reads_from_replica(self):
+        response = self.request('get', reverse('posts:index'))
+        self.assertEqual(response.databases, ('replica', 'default'))
+        self.assertEqual(response.feed_cache_timeout, 0)
+        self.assertEqual(router.db_for_read(Post), 'default')
+
+    def test_page_for_cache_reads_from_primary(self):
+        response = self.request(
+            'get', reverse('posts:index'), primary_only=True
+        )
+        self.assertEqual(response.databases, ('default', 'default'))
+        self.assertEqual(
+            response.feed_cache_timeout, settings.FEED_CACHE_TIMEOUT
+        )
+
+    def test_primary_reads(self):
+        cases = {
+            'other view': ('get', reverse('posts:post_create'), {}),
+            'write': ('post', reverse('posts:index'), {}),
+            'pinned': (
+                'get', reverse('posts:index'),
+                {'HTTP_COOKIE': f'{PIN_COOKIE}=1'},
+            ),
+        }
+        for name, (method, url, extra) in cases.items():
+            with self.subTest(name=name):
+                response = self.request(method, url, **extra)
+                self.assertEqual(response.databases, ('default', 'default'))
+
+    def test_page_cache_miss_renders_from_primary(self):
+        # Базы 'replica' нет: чтение с неё закончилось бы ошибкой.
+        cache.clear()
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_write_pins_to_primary(self):
+        response = self.request('post', reverse('posts:post_create'))
+        self.assertIn(PIN_COOKIE, response.cookies)
+        response = self.request('get', reverse('posts:index'))
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_get_write_pins_to_primary(self):
+        # Как profile_follow: GET, который пишет в БД.
+        def write_then_route(request):
+            router.db_for_write(Follow)
+            return self.route(request)
+
+        self.middleware = ReplicaMiddleware(write_then_route)
+        response = self.request('get', reverse('posts:index'))
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertEqual(response.databases, ('default', 'default'))
@@ -4,3 +4,6 @@
 class PostsConfig(AppConfig):
     name = 'posts'
     verbose_name = 'Yatube: Публикации и пользователи'
+
+    def ready(self):
+        from posts import signals  # noqa: F401
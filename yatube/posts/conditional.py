@@ -0,0 +1,163 @@
+import hashlib
+from functools import wraps
+from http import HTTPStatus
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from core.db_router import PRIMARY
+from posts import feed_cache
+from posts.models import Group, User
+
+SCOPE_ID_KEY = 'scope_id:{}:{}:{}'
+VALIDATED = (HTTPStatus.OK, HTTPStatus.NOT_MODIFIED)
+
+
+def cache_policy(request, view_name):
+    if request.user.is_authenticated:
+        return {'private': True, 'no_cache': True}
+    return {'public': True, 'max_age': settings.PAGE_MAX_AGE[view_name]}
+
+
+def page_scopes(request, scopes, *args, **kwargs):
+    """Области страницы или None, если страницы нет или она закрыта."""
+    if not hasattr(request, '_page_scopes'):
+        page = scopes(request, *args, **kwargs)
+        request._page_scopes = None if page is None else list(page)
+    return request._page_scopes
+
+
+def shared_scopes(request, scopes, *args, **kwargs):
+    """Области страницы без областей читателя, общие для всех.
+
+    Помощники добавляют viewer_scopes в конец списка; от них зависят
+    только дырки страницы (posts.holes), а не её общая часть.
+    """
+    all_scopes = page_scopes(request, scopes, *args, **kwargs)
+    if all_scopes is None:
+        return None
+    viewer = viewer_scopes(request)
+    if viewer and all_scopes[-len(viewer):] == viewer:
+        return all_scopes[:-len(viewer)]
+    return all_scopes
+
+
+def page_state(request, scopes, *args, **kwargs):
+    """Версии и время изменения областей страницы, один раз на запрос."""
+    if not hasattr(request, '_page_state'):
+        all_scopes = page_scopes(request, scopes, *args, **kwargs)
+        request._page_state = (
+            feed_cache.get_versions(*all_scopes),
+            feed_cache.last_changed(*all_scopes),
+        )
+    return request._page_state
+
+
+def page_etag(request, versions):
+    if not request.user.is_authenticated:
+        return f'{versions}:0'
+    # Форма комментария несёт CSRF-токен, а он меняется при входе:
+    # тело из кеша браузера после нового входа не должно подойти.
+    token = hashlib.md5(
+        request.META.get('CSRF_COOKIE', '').encode()
+    ).hexdigest()[:8]
+    return f'{versions}:{request.user.pk}:{token}'
+
+
+def conditional_page(view_name, scopes):
+    """Ответить 304 на неизменившуюся страницу, не рендеря шаблон.
+
+    `scopes(request, *args, **kwargs)` возвращает области лент, от которых
+    зависит страница. Их версии вместе с пользователем образуют ETag,
+    время последнего изменения — Last-Modified. Cache-Control задаётся
+    в settings.PAGE_MAX_AGE. Если `scopes` вернул None (объекта нет
+    или нужен вход), view вызывается как есть. Валидаторы и
+    Cache-Control получают только ответы 200 и 304: ошибка не должна
+    кешироваться и подтверждаться по If-None-Match.
+    """
+    def etag(request, *args, **kwargs):
+        versions, _ = page_state(request, scopes, *args, **kwargs)
+        return page_etag(request, versions)
+
+    def last_modified(request, *args, **kwargs):
+        _, changed = page_state(request, scopes, *args, **kwargs)
+        return changed
+
+    def decorator(view):
+        conditional_view = condition(etag, last_modified)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if page_scopes(request, scopes, *args, **kwargs) is None:
+                return view(request, *args, **kwargs)
+            response = conditional_view(request, *args, **kwargs)
+            if response.status_code not in VALIDATED:
+                del response['ETag']
+                del response['Last-Modified']
+                return response
+            patch_cache_control(response, **cache_policy(request, view_name))
+            return response
+        return wrapper
+    return decorator
+
+
+def viewer_scopes(request):
+    if request.user.is_authenticated:
+        return [f'follow:{request.user.pk}']
+    return []
+
+
+def index_scopes(request):
+    return ('index',)
+
+
+def lookup_id(model, field, value):
+    """id объекта по slug или имени из кеша, без запроса к БД.
+
+    Ключ содержит версию общей области: сигналы меняют её при сохранении
+    и удалении групп, смене имён и удалении пользователей, поэтому
+    устаревшее соответствие становится недостижимым. Несуществующему
+    объекту соответствует 0. Соответствие читается из основной БД:
+    отстающая реплика сохранила бы 0 для только что созданной группы.
+    """
+    key = SCOPE_ID_KEY.format(
+        model._meta.model_name, feed_cache.get_versions(), value
+    )
+    object_id = cache.get(key)
+    if object_id is None:
+        object_id = model.objects.using(PRIMARY).filter(
+            **{field: value}
+        ).values_list('pk', flat=True).first() or 0
+        cache.set(key, object_id, settings.FEED_CACHE_TIMEOUT)
+    return object_id
+
+
+def group_scopes(request, slug):
+    group_id = lookup_id(Group, 'slug', slug)
+    if not group_id:
+        return None
+    return (f'group:{group_id}',)
+
+
+def profile_scopes(request, username):
+    profile_id = lookup_id(User, 'username', username)
+    if not profile_id:
+        return None
+    # Подписки читателя меняют кнопку подписки.
+    return [
+        f'profile:{profile_id}', f'follow:{profile_id}',
+        *viewer_scopes(request),
+    ]
+
+
+def post_scopes(request, post_id):
+    return (f'post:{post_id}',)
+
+
+def follow_scopes(request):
+    if not request.user.is_authenticated:
+        return None
+    # Лента подписок меняется с любым сообщением и с подписками читателя.
+    return ('index', f'follow:{request.user.pk}')
@@ -0,0 +1,70 @@
+import csv
+import json
+
+from posts.models import Comment, Post
+
+CHUNK_SIZE = 2000
+FORMATS = ('jsonl', 'csv')
+# Поля совпадают с форматом import_yatube, выгрузку можно загрузить обратно.
+FIELDS = {
+    'post': ('id', 'text', 'author', 'group', 'pub_date', 'image'),
+    'comment': ('id', 'post', 'author', 'text', 'created'),
+}
+COLUMNS = {
+    'post': (
+        'id', 'text', 'author__username', 'group__slug', 'pub_date', 'image'
+    ),
+    'comment': ('id', 'post_id', 'author__username', 'text', 'created'),
+}
+
+
+class Echo:
+    """Файловый объект для csv.writer, который возвращает строку."""
+
+    def write(self, value):
+        return value
+
+
+def get_queryset(row_type, author=None, group=None):
+    if row_type == 'post':
+        queryset = Post.objects.all()
+        prefix = ''
+    else:
+        queryset = Comment.objects.all()
+        prefix = 'post__'
+    if author is not None:
+        queryset = queryset.filter(**{f'{prefix}author': author})
+    if group is not None:
+        queryset = queryset.filter(**{f'{prefix}group': group})
+    return queryset.order_by('id').values_list(*COLUMNS[row_type])
+
+
+def iter_rows(row_type, chunk_size=CHUNK_SIZE, **filters):
+    """Строки выгрузки по одной; из БД читается по chunk_size за раз."""
+    queryset = get_queryset(row_type, **filters)
+    for values in queryset.iterator(chunk_size=chunk_size):
+        row = dict(zip(FIELDS[row_type], values))
+        for name in ('pub_date', 'created'):
+            if name in row:
+                row[name] = row[name].isoformat()
+        yield row
+
+
+def stream(row_format, row_types=tuple(FIELDS), **filters):
+    """Выгрузка в JSONL или CSV кусками по одной строке.
+
+    В JSONL идут все типы из `row_types` с полем type, в CSV — только
+    первый из них: у сообщений и комментариев разные столбцы.
+    """
+    if row_format == 'csv':
+        row_type = row_types[0]
+        writer = csv.writer(Echo())
+        yield writer.writerow(FIELDS[row_type])
+        for row in iter_rows(row_type, **filters):
+            yield writer.writerow(row.values())
+        return
+    for row_type in row_types:
+        for row in iter_rows(row_type, **filters):
+            yield json.dumps(
+                {'type': row_type, **row}, ensure_ascii=False
+            ) + '\n'
@@ -0,0 +1,97 @@
+import secrets
+import time
+from datetime import datetime, timezone
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from core.db_router import reads_from_replica
+
+VERSION_KEY = 'feed_version:{}'
+CHANGED_KEY = 'feed_changed:{}'
+GLOBAL_SCOPE = 'all'
+
+
+def _initial_version():
+    # После вытеснения ключа версия не должна совпасть со старой,
+    # иначе снова станут видны устаревшие фрагменты.
+    return secrets.randbits(48)
+
+
+def get_versions(*scopes):
+    keys = [VERSION_KEY.format(scope) for scope in (GLOBAL_SCOPE, *scopes)]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _initial_version(), None)
+            versions[key] = cache.get(key)
+    return '.'.join(str(versions[key]) for key in keys)
+
+
+def last_changed(*scopes):
+    """Время последнего изменения областей для заголовка Last-Modified."""
+    keys = [CHANGED_KEY.format(scope) for scope in (GLOBAL_SCOPE, *scopes)]
+    changed = cache.get_many(keys)
+    now = time.time()
+    for key in keys:
+        if key not in changed:
+            # Неизвестное время изменения считается текущим.
+            cache.add(key, now, None)
+            changed[key] = cache.get(key, now)
+    return datetime.fromtimestamp(max(changed.values()), timezone.utc)
+
+
+def bump(*scopes):
+    """Сменить версии областей сейчас и ещё раз после фиксации транзакции.
+
+    Параллельный запрос может прочитать данные до фиксации и сохранить
+    их под версией, сменённой внутри транзакции. Вторая смена после
+    фиксации делает такие записи недостижимыми. Вне транзакции
+    on_commit выполняется сразу.
+    """
+    _bump(scopes)
+    transaction.on_commit(partial(_bump, scopes))
+
+
+def _bump(scopes):
+    for scope in scopes:
+        key = VERSION_KEY.format(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _initial_version(), None)
+    now = time.time()
+    cache.set_many(
+        {CHANGED_KEY.format(scope): now for scope in scopes}, None
+    )
+
+
+def bump_post(post, old_group_id=None):
+    scopes = {'index', f'profile:{post.author_id}', f'post:{post.pk}'}
+    for group_id in (post.group_id, old_group_id):
+        if group_id:
+            scopes.add(f'group:{group_id}')
+    bump(*scopes)
+
+
+def feed_cache_key(request, *scopes):
+    """Ключ фрагмента ленты: версии областей и позиция страницы."""
+    return ':'.join((
+        get_versions(*scopes),
+        request.GET.get('after', ''),
+        request.GET.get('before', ''),
+        request.GET.get('page', ''),
+    ))
+
+
+def feed_cache_context(request, *scopes):
+    # Фрагмент, прочитанный с реплики, берётся из кеша, но не кладётся
+    # в него: тайм-аут 0 означает «не хранить».
+    return {
+        'feed_cache_key': feed_cache_key(request, *scopes),
+        'feed_cache_timeout': (
+            0 if reads_from_replica() else settings.FEED_CACHE_TIMEOUT
+        ),
+    }
@@ -0,0 +1,74 @@
+"""Дырки в общей странице: фрагменты, которые зависят от пользователя.
+
+Тег `{% hole 'имя' аргументы %}` рисует фрагмент сразу, а при
+request.punch_holes оставляет вместо него комментарий-заглушку. Такую
+страницу можно хранить одну на всех пользователей и перед ответом
+заполнять заглушки функцией fill. Пользовательский текст на странице
+экранирован, поэтому подделать заглушку через него нельзя.
+"""
+import re
+from urllib.parse import quote, unquote
+
+from django.template.backends.utils import csrf_input
+from django.template.loader import render_to_string
+from django.utils.html import escape
+
+from posts.viewer import get_viewer
+
+PLACEHOLDER = re.compile(rb'<!--hole:([^>]*?)-->')
+
+HOLES = {}
+
+
+def register(name):
+    def decorator(render):
+        HOLES[name] = render
+        return render
+    return decorator
+
+
+def placeholder(name, *args):
+    return ':'.join(
+        ['<!--hole', name, *(quote(str(arg), safe='') for arg in args)]
+    ) + '-->'
+
+
+def render(request, name, *args):
+    return HOLES[name](request, *args)
+
+
+def fill(request, content, charset='utf-8'):
+    def replace(match):
+        name, *args = match.group(1).decode().split(':')
+        return str(
+            render(request, name, *map(unquote, args))
+        ).encode(charset)
+    return PLACEHOLDER.sub(replace, content)
+
+
+@register('username')
+def username(request):
+    return escape(request.user.username)
+
+
+@register('csrf_token')
+def csrf_token(request):
+    return csrf_input(request)
+
+
+# Аргументы из заглушки приходят строками, поэтому id приводятся к int.
+@register('follow_button')
+def follow_button(request, username, author_id):
+    return render_to_string('posts/includes/follow_button.html', {
+        'username': username,
+        'following': get_viewer(request).follows(int(author_id)),
+    })
+
+
+@register('edit_button')
+def edit_button(request, post_id, author_id):
+    if not get_viewer(request).is_author(int(author_id)):
+        return ''
+    return render_to_string('posts/includes/edit_button.html', {
+        'post_id': post_id,
+    })
@@ -0,0 +1,129 @@
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from PIL import features
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+FORMATS = {
+    'JPEG': 'image/jpeg',
+    'WEBP': 'image/webp',
+}
+SIZES = '(min-width: 768px) 75vw, 100vw'
+
+
+@lru_cache(maxsize=None)
+def formats():
+    # Pillow может быть собран без libwebp: тогда отдаём только JPEG.
+    if features.check('webp'):
+        return ('WEBP', 'JPEG')
+    return ('JPEG',)
+
+
+def geometry(width):
+    base_width, base_height = settings.POST_IMAGE_RATIO
+    return f'{width}x{round(width * base_height / base_width)}'
+
+
+def thumbnail_options(image_format):
+    return {'crop': 'center', 'upscale': True, 'format': image_format}
+
+
+def variants():
+    """Пары (geometry, options) для всех ширин и форматов картинки."""
+    for image_format in formats():
+        for width in settings.POST_IMAGE_WIDTHS:
+            yield geometry(width), thumbnail_options(image_format)
+
+
+def cached_thumbnail(image, geometry_string, **options):
+    """Готовое превью из kvstore sorl-thumbnail или None.
+
+    Имя превью считается так же, как в ThumbnailBackend.get_thumbnail,
+    но при промахе картинка не создаётся: это дело thumbnails.schedule
+    и команды generate_thumbnails, а не запроса. Публичного поиска без
+    создания в sorl нет, поэтому используется _get_thumbnail_filename;
+    версия sorl-thumbnail закреплена в requirements.txt, и при её
+    обновлении имена нужно сверить с get_thumbnail (это проверяет
+    test_feed_renders_responsive_image).
+    """
+    backend = default.backend
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(thumbnail_settings, attr)
+        if value != getattr(default_settings, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(
+        ImageFile(image), geometry_string, options
+    )
+    return default.kvstore.get(ImageFile(name, default.storage))
+
+
+def ready_widths(image, image_format):
+    """Пары (ширина, превью) для уже созданных превью одного формата."""
+    candidates = []
+    for width in settings.POST_IMAGE_WIDTHS:
+        thumbnail = cached_thumbnail(
+            image, geometry(width), **thumbnail_options(image_format)
+        )
+        if thumbnail is not None and thumbnail.size:
+            candidates.append((width, thumbnail))
+    return candidates
+
+
+def default_thumbnail(candidates):
+    """Первое превью не уже POST_IMAGE_DEFAULT_WIDTH или самое широкое."""
+    for width, thumbnail in candidates:
+        if width >= settings.POST_IMAGE_DEFAULT_WIDTH:
+            return thumbnail
+    return candidates[-1][1]
+
+
+def original(image):
+    try:
+        if image.storage.exists(image.name):
+            return image
+    except SuspiciousFileOperation:
+        # Путь вне MEDIA_ROOT: такой файл всё равно не отдать.
+        pass
+    return None
+
+
+def picture(image):
+    """Источники для <picture>: srcset по форматам и запасная картинка.
+
+    Берутся только уже созданные превью. Пока их нет, показывается
+    исходная картинка без srcset.
+    """
+    sources = []
+    srcset = ''
+    fallback = None
+    for image_format in formats():
+        candidates = ready_widths(image, image_format)
+        if not candidates:
+            continue
+        format_srcset = ', '.join(
+            f'{thumbnail.url} {width}w' for width, thumbnail in candidates
+        )
+        if image_format == 'JPEG':
+            srcset = format_srcset
+            fallback = default_thumbnail(candidates)
+        else:
+            sources.append({
+                'type': FORMATS[image_format],
+                'srcset': format_srcset,
+            })
+    if fallback is None:
+        fallback = original(image)
+    if fallback is None:
+        return None
+    return {
+        'sources': sources,
+        'srcset': srcset,
+        'fallback': fallback,
+        'sizes': SIZES,
+    }
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+from posts.models import Group, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает сообщения и комментарии автора или группы в JSONL или '
+        'CSV, не загружая их в память целиком'
+    )
+
+    def add_arguments(self, parser):
+        source = parser.add_mutually_exclusive_group(required=True)
+        source.add_argument('--author', help='username автора')
+        source.add_argument('--group', help='slug группы')
+        parser.add_argument('--format', choices=export.FORMATS,
+                            default='jsonl')
+        parser.add_argument(
+            '--type', choices=tuple(export.FIELDS),
+            help='Только сообщения или только комментарии; для CSV — post',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=export.CHUNK_SIZE,
+        )
+        parser.add_argument(
+            '--output', help='Файл выгрузки; по умолчанию stdout',
+        )
+
+    def get_filters(self, options):
+        if options['author']:
+            author = User.objects.filter(username=options['author']).first()
+            if author is None:
+                raise CommandError(f'Нет пользователя {options["author"]}')
+            return {'author': author}
+        group = Group.objects.filter(slug=options['group']).first()
+        if group is None:
+            raise CommandError(f'Нет группы {options["group"]}')
+        return {'group': group}
+
+    def handle(self, *args, **options):
+        row_types = tuple(export.FIELDS)
+        if options['type'] or options['format'] == 'csv':
+            row_types = (options['type'] or 'post',)
+        chunks = export.stream(
+            options['format'],
+            row_types,
+            chunk_size=options['chunk_size'],
+            **self.get_filters(options),
+        )
+        if not options['output']:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+        with open(options['output'], 'w', newline='',
+                  encoding='utf-8') as output:
+            output.writelines(chunks)
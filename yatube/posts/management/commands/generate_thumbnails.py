@@ -0,0 +1,75 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт превью картинок существующих сообщений; после сбоя '
+        'продолжает с последней сохранённой позиции'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.THUMBNAIL_WORKERS,
+        )
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument(
+            '--checkpoint',
+            default=os.path.join(settings.BASE_DIR, '.thumbnails_checkpoint'),
+            help='Файл с id последнего обработанного сообщения',
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Начать сначала, не читая сохранённую позицию',
+        )
+
+    def read_checkpoint(self, path):
+        try:
+            with open(path) as checkpoint:
+                return int(checkpoint.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def write_checkpoint(self, path, last_id):
+        with open(f'{path}.tmp', 'w') as checkpoint:
+            checkpoint.write(str(last_id))
+        os.replace(f'{path}.tmp', path)
+
+    def handle(self, *args, **options):
+        path = options['checkpoint']
+        last_id = 0 if options['restart'] else self.read_checkpoint(path)
+        if last_id:
+            self.stdout.write(f'Продолжаю после сообщения {last_id}')
+        posts = Post.objects.exclude(image='').order_by('id').values_list(
+            'id', 'image'
+        )
+        processed = 0
+        pool = None
+        if options['workers'] > 1:
+            pool = ThreadPoolExecutor(max_workers=options['workers'])
+            generate = partial(pool.map, thumbnails.generate_in_worker)
+        else:
+            generate = partial(map, thumbnails.generate)
+        try:
+            while True:
+                batch = list(
+                    posts.filter(id__gt=last_id)[:options['batch_size']]
+                )
+                if not batch:
+                    break
+                processed += sum(generate(image for _, image in batch))
+                last_id = batch[-1][0]
+                self.write_checkpoint(path, last_id)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        if os.path.exists(path):
+            os.remove(path)
+        self.stdout.write(f'Готово превью: {processed}')
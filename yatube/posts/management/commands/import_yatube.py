@@ -0,0 +1,118 @@
+import json
+import os
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.importer import (
+    TYPES, Importer, Touched, read_rows, rebuild_derived,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает пользователей, группы, сообщения, комментарии и подписки '
+        'из JSONL или CSV; после сбоя продолжает с сохранённой позиции'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл .jsonl или .csv')
+        parser.add_argument('--format', choices=('jsonl', 'csv'))
+        parser.add_argument(
+            '--type', choices=TYPES,
+            help='Тип строк, в которых нет поля type',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=5000,
+            help='Строк в одной транзакции',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--checkpoint',
+            default=os.path.join(settings.BASE_DIR, '.import_checkpoint'),
+            help=(
+                'Файл с числом уже загруженных строк; рядом с ним в '
+                '<checkpoint>.touched копятся id строк для пересборки'
+            ),
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Начать сначала, не читая сохранённую позицию',
+        )
+        parser.add_argument(
+            '--no-rebuild', action='store_true',
+            help='Не пересобирать ленты, счётчики и поисковый индекс',
+        )
+
+    def read_checkpoint(self, path, source):
+        try:
+            with open(path) as checkpoint:
+                state = json.load(checkpoint)
+        except (FileNotFoundError, ValueError):
+            return 0
+        if state.get('source') != source:
+            return 0
+        return state.get('rows', 0)
+
+    def write_checkpoint(self, path, source, rows):
+        with open(f'{path}.tmp', 'w') as checkpoint:
+            json.dump({'source': source, 'rows': rows}, checkpoint)
+        os.replace(f'{path}.tmp', path)
+
+    def record_touched(self, path, touched):
+        # Дописывается после каждой пачки: после сбоя продолжение
+        # пересоберёт и то, что загрузил прошлый запуск.
+        with open(path, 'a') as record:
+            record.write(json.dumps(touched.as_dict()) + '\n')
+
+    def read_touched(self, path):
+        touched = Touched()
+        try:
+            with open(path) as record:
+                for line in record:
+                    touched.update(Touched(**json.loads(line)))
+        except FileNotFoundError:
+            pass
+        return touched
+
+    def handle(self, *args, **options):
+        source = os.path.abspath(options['path'])
+        if not os.path.exists(source):
+            raise CommandError(f'Файл {source} не найден')
+        row_format = options['format'] or (
+            'csv' if source.endswith('.csv') else 'jsonl'
+        )
+        checkpoint = options['checkpoint']
+        done = 0 if options['restart'] else self.read_checkpoint(
+            checkpoint, source
+        )
+        touched_path = f'{checkpoint}.touched'
+        if done:
+            self.stdout.write(f'Продолжаю после строки {done}')
+        elif os.path.exists(touched_path):
+            os.remove(touched_path)
+        rows = islice(read_rows(source, row_format), done, None)
+        importer = Importer(options['batch_size'])
+        imported = 0
+        started = time.monotonic()
+        while True:
+            chunk = list(islice(rows, options['chunk_size']))
+            if not chunk:
+                break
+            touched = importer.import_chunk(chunk, options['type'])
+            self.record_touched(touched_path, touched)
+            done += len(chunk)
+            imported += len(chunk)
+            self.write_checkpoint(checkpoint, source, done)
+            rate = imported / max(time.monotonic() - started, 1e-6)
+            self.stdout.write(f'Строк: {done}, {rate:.0f} строк/с')
+        if not options['no_rebuild']:
+            rebuild_derived(self.read_touched(touched_path))
+        for path in (checkpoint, touched_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self.stdout.write(
+            f'Прочитано строк: {imported}, пропущено: {importer.skipped}'
+        )
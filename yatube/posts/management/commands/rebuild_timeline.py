@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает материализованные ленты подписок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', action='append', dest='usernames',
+            help='Пересобрать ленту только этого пользователя',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=timeline.BATCH_SIZE,
+        )
+
+    def handle(self, *args, **options):
+        user_ids = None
+        if options['usernames']:
+            user_ids = list(User.objects.filter(
+                username__in=options['usernames']
+            ).values_list('id', flat=True))
+        total = timeline.rebuild(user_ids, batch_size=options['batch_size'])
+        self.stdout.write(f'Обработано подписок: {total}')
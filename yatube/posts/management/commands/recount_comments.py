@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from posts import feed_cache, stats
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики комментариев сообщений'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=stats.BATCH_SIZE,
+        )
+
+    def handle(self, *args, **options):
+        post_ids = Post.objects.order_by('id').values_list('id', flat=True)
+        batch_size = options['batch_size']
+        last_id = 0
+        fixed = 0
+        while True:
+            batch = list(post_ids.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            fixed += stats.recount_comments(batch)
+            last_id = batch[-1]
+        if fixed:
+            # bulk_update не вызывает сигналы, а счётчики есть в кеше лент.
+            feed_cache.bump(feed_cache.GLOBAL_SCOPE)
+        self.stdout.write(f'Исправлено сообщений: {fixed}')
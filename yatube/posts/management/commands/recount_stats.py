@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from posts import stats
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики публикаций и подписок авторов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=stats.BATCH_SIZE,
+        )
+
+    def handle(self, *args, **options):
+        user_ids = User.objects.order_by('id').values_list('id', flat=True)
+        batch_size = options['batch_size']
+        last_id = 0
+        fixed = 0
+        while True:
+            batch = list(user_ids.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            fixed += stats.recount(batch)
+            last_id = batch[-1]
+        self.stdout.write(f'Исправлено записей: {fixed}')
@@ -0,0 +1,193 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date, parse_http_date_safe
+
+from posts import conditional, feed_cache, holes
+
+PAGE_KEY = 'page:{}:{}:{}:{}'
+
+# Страницы, которые гость получает из кеша, и области их лент.
+PAGE_SCOPES = {
+    'posts:index': conditional.index_scopes,
+    'posts:group_list': conditional.group_scopes,
+    'posts:profile': conditional.profile_scopes,
+    'posts:post_detail': conditional.post_scopes,
+}
+
+
+def is_anonymous(request):
+    # Сессии ещё нет: гостем считается запрос без cookie сессии и сообщений.
+    return not (
+        settings.SESSION_COOKIE_NAME in request.COOKIES
+        or 'messages' in request.COOKIES
+    )
+
+
+class AnonymousPageCacheMiddleware:
+    """Готовые страницы лент для гостей из кеша, до сессий и авторизации.
+
+    Ключ состоит из версий областей лент страницы и полного адреса,
+    поэтому сигналы Post, Comment, Follow и Group, которые меняют версии,
+    сразу делают устаревшие страницы недостижимыми.
+    """
+
+    audience = 'guest'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def applies(self, request):
+        return is_anonymous(request)
+
+    def prepare(self, request):
+        # AuthenticationMiddleware ещё не выполнен, а без cookie сессии
+        # он всё равно вернул бы анонимного пользователя.
+        request.user = AnonymousUser()
+
+    def page_key(self, request):
+        if request.method != 'GET' or not self.applies(request):
+            return None
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+        scopes = PAGE_SCOPES.get(match.view_name)
+        if scopes is None:
+            return None
+        self.prepare(request)
+        request.resolver_match = match
+        shared = conditional.shared_scopes(
+            request, scopes, *match.args, **match.kwargs
+        )
+        if shared is None:
+            return None
+        versions = feed_cache.get_versions(*shared)
+        url = hashlib.md5(
+            request.build_absolute_uri().encode()
+        ).hexdigest()
+        return PAGE_KEY.format(self.audience, match.view_name, versions, url)
+
+    def __call__(self, request):
+        key = self.page_key(request)
+        if key is None:
+            return self.get_response(request)
+        page = cache.get(key)
+        if page is not None:
+            return self.cached_response(request, page)
+        # Страница ляжет в кеш под текущими версиями: читать её с
+        # отстающей реплики нельзя (core.db_router.reads_from_replica).
+        request.primary_only = True
+        response = self.get_response(request)
+        if self.cacheable(response):
+            cache.set(key, (
+                response.status_code,
+                list(response.items()),
+                response.content,
+            ), settings.PAGE_CACHE_TIMEOUT)
+        return response
+
+    def cacheable(self, response):
+        return (
+            response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and 'private' not in response.get('Cache-Control', '')
+        )
+
+    def build_response(self, page):
+        status, headers, content = page
+        response = HttpResponse(content, status=status)
+        for name, value in headers:
+            response[name] = value
+        return response
+
+    def cached_response(self, request, page):
+        response = self.build_response(page)
+        return get_conditional_response(
+            request,
+            etag=response.get('ETag'),
+            last_modified=parse_http_date_safe(
+                response.get('Last-Modified', '')
+            ),
+            response=response,
+        )
+
+
+class UserPageCacheMiddleware(AnonymousPageCacheMiddleware):
+    """Общие страницы лент для вошедших пользователей с дырками.
+
+    Ставится после AuthenticationMiddleware. Страница рендерится
+    с заглушками вместо фрагментов из posts.holes и хранится одна на всех
+    под ключом с версиями conditional.shared_scopes: подписки читателя
+    на общую часть не влияют. Перед ответом заглушки заполняются для текущего
+    пользователя, а ETag и Last-Modified считаются по его областям,
+    как в conditional_page.
+    """
+
+    audience = 'user'
+
+    def applies(self, request):
+        return request.user.is_authenticated
+
+    def prepare(self, request):
+        pass
+
+    def __call__(self, request):
+        key = self.page_key(request)
+        if key is None:
+            return self.get_response(request)
+        page = cache.get(key)
+        if page is not None:
+            return self.fill(request, self.cached_response(request, page))
+        request.punch_holes = True
+        request.primary_only = True
+        response = self.get_response(request)
+        if self.cacheable(response):
+            cache.set(key, (
+                response.status_code,
+                list(response.items()),
+                response.content,
+            ), settings.PAGE_CACHE_TIMEOUT)
+        return self.fill(request, response)
+
+    def cacheable(self, response):
+        # Страница личная для браузера, но не для общего кеша на сервере:
+        # всё личное в ней — заглушки.
+        return (
+            response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+        )
+
+    def cached_response(self, request, page):
+        response = self.build_response(page)
+        match = request.resolver_match
+        versions, changed = conditional.page_state(
+            request, PAGE_SCOPES[match.view_name],
+            *match.args, **match.kwargs,
+        )
+        etag = quote_etag(conditional.page_etag(request, versions))
+        last_modified = int(changed.timestamp())
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return get_conditional_response(
+            request, etag=etag, last_modified=last_modified,
+            response=response,
+        )
+
+    def fill(self, request, response):
+        # Заглушки есть и на страницах ошибок: они тоже наследуют base.html.
+        if response.streaming:
+            return response
+        response.content = holes.fill(
+            request, response.content, response.charset
+        )
+        if response.has_header('Content-Length'):
+            response['Content-Length'] = len(response.content)
+        return response
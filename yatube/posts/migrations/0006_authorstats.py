@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def fill_stats(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Post = apps.get_model('posts', 'Post')
+    Follow = apps.get_model('posts', 'Follow')
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    stats = {
+        user_id: AuthorStats(user_id=user_id)
+        for user_id in User.objects.values_list('id', flat=True)
+    }
+    queries = (
+        ('posts_count', Post.objects.values_list('author_id')),
+        ('followers_count', Follow.objects.values_list('author_id')),
+        ('following_count', Follow.objects.values_list('user_id')),
+    )
+    for counter, queryset in queries:
+        for user_id, total in queryset.annotate(total=Count('id')).order_by():
+            if user_id in stats:
+                setattr(stats[user_id], counter, total)
+    AuthorStats.objects.bulk_create(stats.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0005_timelineentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('user', models.OneToOneField(help_text='Пользователь', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('posts_count', models.PositiveIntegerField(default=0, help_text='Количество публикаций', verbose_name='Публикаций')),
+                ('followers_count', models.PositiveIntegerField(default=0, help_text='Количество подписчиков', verbose_name='Подписчиков')),
+                ('following_count', models.PositiveIntegerField(default=0, help_text='Количество подписок', verbose_name='Подписок')),
+            ],
+            options={
+                'verbose_name': 'Статистика автора',
+                'verbose_name_plural': 'Статистика авторов',
+            },
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
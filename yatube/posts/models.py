@@ -60,11 +60,24 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Комментариев',
+        help_text='Количество комментариев'
+    )
 
     class Meta:
         ordering = ('-pub_date', )
         verbose_name = 'Публикация'
         verbose_name_plural = 'Публикации'
+        indexes = (
+            models.Index(fields=('pub_date', ), name='post_pub_date_idx'),
+            models.Index(fields=('author', 'pub_date'),
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=('group', 'pub_date'),
+                         name='post_group_pub_date_idx'),
+        )
 
     def __str__(self):
         return self.text[:30]
@@ -99,6 +112,10 @@ class Comment(models.Model):
         ordering = ('-created',)
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = (
+            models.Index(fields=('post', 'created'),
+                         name='comment_post_created_idx'),
+        )
 
     def __str__(self):
         return self.text[:30]
@@ -128,3 +145,67 @@ class Follow(models.Model):
 
     def __str__(self):
         return self.user.username + ' follow ' + self.author.username
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             verbose_name='Подписчик',
+                             help_text='Владелец ленты',
+                             related_name='timeline')
+    post = models.ForeignKey(Post,
+                             on_delete=models.CASCADE,
+                             verbose_name='Сообщение',
+                             help_text='Сообщение автора из подписок',
+                             related_name='timeline_entries')
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации',
+        help_text='Копия даты публикации сообщения'
+    )
+
+    class Meta:
+        ordering = ('-pub_date', )
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Записи ленты подписок'
+        constraints = (
+            UniqueConstraint(fields=('user', 'post', ),
+                             name='unique_timeline_entry'),
+        )
+        indexes = (
+            models.Index(fields=('user', '-pub_date', '-post'),
+                         name='timeline_user_pub_date_idx'),
+        )
+
+    def __str__(self):
+        return f'{self.user_id}: {self.post_id}'
+
+
+class AuthorStats(models.Model):
+    user = models.OneToOneField(User,
+                                on_delete=models.CASCADE,
+                                primary_key=True,
+                                verbose_name='Пользователь',
+                                help_text='Пользователь',
+                                related_name='stats')
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Публикаций',
+        help_text='Количество публикаций'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Подписчиков',
+        help_text='Количество подписчиков'
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Подписок',
+        help_text='Количество подписок'
+    )
+
+    class Meta:
+        verbose_name = 'Статистика автора'
+        verbose_name_plural = 'Статистика авторов'
+
+    def __str__(self):
+        return f'{self.user_id}: {self.posts_count}'
@@ -0,0 +1,113 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from posts import feed_cache, stats, timeline
+from posts.models import Comment, Follow, Group, Post, User
+
+USER_NAME_FIELDS = ('username', 'first_name', 'last_name')
+
+
+@receiver(pre_save, sender=Post)
+def post_remember_group(sender, instance, raw=False, **kwargs):
+    if instance.pk and not raw:
+        instance._old_group_id = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('group_id', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+def post_fan_out(sender, instance, created, raw=False, **kwargs):
+    feed_cache.bump_post(instance, getattr(instance, '_old_group_id', None))
+    if created and not raw:
+        timeline.fan_out_post(instance)
+        stats.bump(instance.author_id, 'posts_count', 1)
+
+
+@receiver(post_delete, sender=Post)
+def post_removed(sender, instance, **kwargs):
+    feed_cache.bump_post(instance)
+    stats.bump(instance.author_id, 'posts_count', -1)
+
+
+def bump_comment_feeds(comment):
+    # Счётчик комментариев виден на карточках во всех лентах сообщения.
+    if Comment.post.is_cached(comment):
+        post = comment.post
+    else:
+        post = Post.objects.only('author_id', 'group_id').filter(
+            pk=comment.post_id
+        ).first()
+    if post is None:
+        feed_cache.bump(f'post:{comment.post_id}')
+    else:
+        feed_cache.bump_post(post)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if not created or raw:
+        feed_cache.bump(f'post:{instance.post_id}')
+        return
+    stats.bump_comments(instance.post_id, 1)
+    bump_comment_feeds(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_removed(sender, instance, **kwargs):
+    stats.bump_comments(instance.post_id, -1)
+    bump_comment_feeds(instance)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    feed_cache.bump(feed_cache.GLOBAL_SCOPE)
+
+
+@receiver(pre_save, sender=User)
+def user_remember_names(sender, instance, update_fields=None, raw=False,
+                        **kwargs):
+    instance._names_changed = False
+    if raw or not instance.pk:
+        return
+    if update_fields and not set(update_fields) & set(USER_NAME_FIELDS):
+        return
+    old_names = User.objects.filter(
+        pk=instance.pk
+    ).values_list(*USER_NAME_FIELDS).first()
+    names = tuple(getattr(instance, name) for name in USER_NAME_FIELDS)
+    instance._names_changed = old_names is not None and old_names != names
+
+
+@receiver(post_save, sender=User)
+def user_names_changed(sender, instance, **kwargs):
+    if getattr(instance, '_names_changed', False):
+        feed_cache.bump(feed_cache.GLOBAL_SCOPE)
+
+
+@receiver(post_delete, sender=User)
+def user_removed(sender, instance, **kwargs):
+    # Имя освободилось: conditional.lookup_id не должен вернуть старый id.
+    feed_cache.bump(feed_cache.GLOBAL_SCOPE)
+
+
+@receiver(post_save, sender=Follow)
+def follow_backfill(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and instance.user_id and instance.author_id:
+        timeline.add_author(instance.user_id, instance.author_id)
+        feed_cache.bump(
+            f'follow:{instance.user_id}', f'follow:{instance.author_id}'
+        )
+        stats.bump(instance.author_id, 'followers_count', 1)
+        stats.bump(instance.user_id, 'following_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def unfollow_cleanup(sender, instance, **kwargs):
+    if instance.user_id and instance.author_id:
+        timeline.remove_author(instance.user_id, instance.author_id)
+        feed_cache.bump(
+            f'follow:{instance.user_id}', f'follow:{instance.author_id}'
+        )
+        stats.bump(instance.author_id, 'followers_count', -1)
+        stats.bump(instance.user_id, 'following_count', -1)
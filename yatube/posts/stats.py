@@ -0,0 +1,87 @@
+from django.db import transaction
+from django.db.models import Count, F
+
+from posts.models import AuthorStats, Comment, Follow, Post
+
+BATCH_SIZE = 500
+COUNTERS = ('posts_count', 'followers_count', 'following_count')
+
+
+def count_stats(user_ids):
+    """Посчитать счётчики заново по таблицам Post и Follow."""
+    stats = {user_id: dict.fromkeys(COUNTERS, 0) for user_id in user_ids}
+    queries = (
+        ('posts_count', Post.objects.filter(
+            author_id__in=user_ids
+        ).values_list('author_id')),
+        ('followers_count', Follow.objects.filter(
+            author_id__in=user_ids
+        ).values_list('author_id')),
+        ('following_count', Follow.objects.filter(
+            user_id__in=user_ids
+        ).values_list('user_id')),
+    )
+    for counter, queryset in queries:
+        for user_id, total in queryset.annotate(total=Count('id')).order_by():
+            stats[user_id][counter] = total
+    return stats
+
+
+def recount(user_ids):
+    """Исправить расхождения счётчиков; вернуть число исправленных записей."""
+    actual = count_stats(user_ids)
+    existing = AuthorStats.objects.in_bulk(user_ids)
+    missing = []
+    changed = []
+    for user_id, counters in actual.items():
+        stats = existing.get(user_id)
+        if stats is None:
+            missing.append(AuthorStats(user_id=user_id, **counters))
+        elif any(getattr(stats, name) != value
+                 for name, value in counters.items()):
+            for name, value in counters.items():
+                setattr(stats, name, value)
+            changed.append(stats)
+    with transaction.atomic():
+        AuthorStats.objects.bulk_create(missing, ignore_conflicts=True)
+        AuthorStats.objects.bulk_update(changed, COUNTERS)
+    return len(missing) + len(changed)
+
+
+def get_stats(user):
+    try:
+        return user.stats
+    except AuthorStats.DoesNotExist:
+        recount([user.pk])
+        return AuthorStats.objects.get(pk=user.pk)
+
+
+def bump(user_id, counter, delta):
+    stats = AuthorStats.objects.filter(user_id=user_id)
+    if delta < 0:
+        stats = stats.filter(**{f'{counter}__gte': -delta})
+    updated = stats.update(**{counter: F(counter) + delta})
+    if not updated and delta > 0:
+        recount([user_id])
+
+
+def recount_comments(post_ids):
+    """Исправить счётчики комментариев; вернуть число исправленных."""
+    totals = dict(Comment.objects.filter(
+        post_id__in=post_ids
+    ).values_list('post_id').annotate(total=Count('id')).order_by())
+    changed = []
+    for post in Post.objects.filter(id__in=post_ids).only('comments_count'):
+        total = totals.get(post.id, 0)
+        if post.comments_count != total:
+            post.comments_count = total
+            changed.append(post)
+    Post.objects.bulk_update(changed, ('comments_count',))
+    return len(changed)
+
+
+def bump_comments(post_id, delta):
+    posts = Post.objects.filter(pk=post_id)
+    if delta < 0:
+        posts = posts.filter(comments_count__gte=-delta)
+    posts.update(comments_count=F('comments_count') + delta)
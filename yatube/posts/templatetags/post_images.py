@@ -0,0 +1,13 @@
+from django import template
+
+from posts import images
+
+register = template.Library()
+
+
+@register.inclusion_tag('posts/includes/post_image.html')
+def post_image(image, lazy=True):
+    return {
+        'picture': images.picture(image) if image else None,
+        'lazy': lazy,
+    }
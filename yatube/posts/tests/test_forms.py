@@ -1,5 +1,6 @@
 ﻿import shutil
 import tempfile
+from unittest import mock
 
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.auth import get_user_model
@@ -7,6 +8,7 @@ from django.conf import settings
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
+from posts.forms import PostForm
 from posts.models import Group, Post, Comment
 
 User = get_user_model()
@@ -110,6 +112,27 @@ class FormsPostCreateTests(TestCase):
         self.assertEquals(post.text, 'Тест 2')
         self.assertEquals(post.group, new_group)
 
+    def test_edit_keeps_concurrent_comments_count(self):
+        post = Post.objects.create(
+            text='Тест', author=FormsPostCreateTests.user
+        )
+        is_valid = PostForm.is_valid
+
+        def comment_while_editing(form):
+            Comment.objects.create(
+                post=post, author=FormsPostCreateTests.user, text='Ответ'
+            )
+            return is_valid(form)
+
+        with mock.patch.object(PostForm, 'is_valid', comment_while_editing):
+            self.authorized_client.post(
+                reverse('posts:post_edit', kwargs={'post_id': post.id}),
+                data={'text': 'Тест 2'},
+            )
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'Тест 2')
+        self.assertEqual(post.comments_count, 1)
+
 
 class CommentsFormTests(TestCase):
     @classmethod
@@ -0,0 +1,187 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts.models import AuthorStats, Comment, Follow, Group, Post
+
+TEMP_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+User = get_user_model()
+
+ROWS = [
+    {'type': 'user', 'username': 'author', 'first_name': 'Лев'},
+    {'type': 'user', 'username': 'reader'},
+    {'type': 'group', 'slug': 'books', 'title': 'Книги'},
+    {'type': 'post', 'id': 10, 'text': 'Первое', 'author': 'author',
+     'group': 'books', 'pub_date': '2020-01-02T03:04:05+00:00'},
+    {'type': 'post', 'id': 11, 'text': 'Второе', 'author': 'author'},
+    {'type': 'comment', 'post': 10, 'author': 'reader', 'text': 'Ответ',
+     'created': '2020-01-03T00:00:00+00:00'},
+    {'type': 'follow', 'user': 'reader', 'author': 'author'},
+]
+
+
+class ImportCommandTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.checkpoint = os.path.join(TEMP_DIR, 'checkpoint')
+
+    def write(self, name, rows):
+        path = os.path.join(TEMP_DIR, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.writelines(
+                json.dumps(row, ensure_ascii=False) + '\n' for row in rows
+            )
+        return path
+
+    def run_import(self, path, **options):
+        out = StringIO()
+        call_command(
+            'import_yatube', path, checkpoint=self.checkpoint, stdout=out,
+            **options
+        )
+        return out.getvalue()
+
+    def test_import_jsonl(self):
+        out = self.run_import(self.write('data.jsonl', ROWS), chunk_size=3)
+
+        self.assertIn('строк/с', out)
+        self.assertIn('Прочитано строк: 7, пропущено: 0', out)
+        post = Post.objects.get(pk=10)
+        self.assertEqual(post.author.first_name, 'Лев')
+        self.assertEqual(post.group, Group.objects.get(slug='books'))
+        self.assertEqual(post.pub_date.year, 2020)
+        self.assertEqual(Comment.objects.get(post=post).created.year, 2020)
+        self.assertGreater(
+            Post.objects.get(pk=11).pub_date, post.pub_date
+        )
+        reader = User.objects.get(username='reader')
+        self.assertFalse(reader.has_usable_password())
+        self.assertTrue(Follow.objects.filter(user=reader).exists())
+        self.assertEqual(reader.timeline.count(), 2)
+        self.assertEqual(
+            AuthorStats.objects.get(pk=post.author_id).posts_count, 2
+        )
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_import_csv(self):
+        User.objects.create_user(username='author')
+        path = os.path.join(TEMP_DIR, 'posts.csv')
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write('id,text,author,group\n1,Из CSV,author,\n')
+        self.run_import(path, type='post')
+        self.assertEqual(Post.objects.get(pk=1).text, 'Из CSV')
+
+    def test_bad_rows_are_skipped(self):
+        rows = [
+            {'type': 'post', 'text': 'Без автора', 'author': 'nobody'},
+            {'type': 'comment', 'post': 404, 'author': 'nobody', 'text': '-'},
+            {'type': 'unknown'},
+        ]
+        out = self.run_import(self.write('bad.jsonl', rows))
+        self.assertIn('пропущено: 3', out)
+        self.assertFalse(Post.objects.exists())
+
+    def test_import_over_existing_rows(self):
+        author = User.objects.create_user(username='author')
+        other = Post.objects.create(pk=10, text='Чужое', author=author)
+        kept = Comment.objects.create(
+            pk=5, post=other, author=author, text='Свой'
+        )
+        rows = [
+            {'type': 'user', 'username': 'reader'},
+            {'type': 'post', 'id': 10, 'text': 'Первое', 'author': 'author',
+             'pub_date': '2020-01-02T03:04:05+00:00'},
+            {'type': 'comment', 'post': 10, 'author': 'reader',
+             'text': 'К первому'},
+            {'type': 'post', 'id': 12, 'text': 'Новое', 'author': 'author'},
+            {'type': 'comment', 'id': 5, 'post': 12, 'author': 'reader',
+             'text': 'Занятый id', 'created': '2020-01-03T00:00:00+00:00'},
+        ]
+        out = self.run_import(self.write('existing.jsonl', rows))
+
+        self.assertIn('пропущено: 3', out)
+        self.assertEqual(Post.objects.get(pk=10).pub_date, other.pub_date)
+        self.assertEqual(
+            list(Comment.objects.values_list('pk', 'text')),
+            [(kept.pk, 'Свой')],
+        )
+        self.assertEqual(Comment.objects.get().created, kept.created)
+        self.assertTrue(Post.objects.filter(pk=12, text='Новое').exists())
+
+    def test_rebuild_is_limited_to_imported_rows(self):
+        other = User.objects.create_user(username='other')
+        AuthorStats.objects.create(user=other, posts_count=99)
+        self.run_import(self.write('data.jsonl', ROWS))
+        self.assertEqual(AuthorStats.objects.get(pk=other.pk).posts_count, 99)
+        self.assertEqual(
+            AuthorStats.objects.get(user__username='author').posts_count, 2
+        )
+
+    def test_resume_rebuilds_rows_of_the_failed_run(self):
+        path = self.write('failed.jsonl', ROWS)
+        with mock.patch(
+            'posts.management.commands.import_yatube.rebuild_derived',
+            side_effect=RuntimeError,
+        ):
+            with self.assertRaises(RuntimeError):
+                self.run_import(path, chunk_size=3)
+        reader = User.objects.get(username='reader')
+        self.assertEqual(reader.timeline.count(), 0)
+
+        self.run_import(path)
+        self.assertEqual(reader.timeline.count(), 2)
+        self.assertFalse(os.path.exists(f'{self.checkpoint}.touched'))
+
+    def test_resume_from_checkpoint(self):
+        path = self.write('resume.jsonl', ROWS)
+        with open(self.checkpoint, 'w') as file:
+            json.dump({'source': path, 'rows': 4}, file)
+        User.objects.create_user(username='author')
+        User.objects.create_user(username='reader')
+        Post.objects.create(pk=10, text='Первое', author=User.objects.get(
+            username='author'
+        ))
+
+        out = self.run_import(path)
+        self.assertIn('Продолжаю после строки 4', out)
+        self.assertEqual(
+            sorted(Post.objects.values_list('pk', flat=True)), [10, 11]
+        )
+        self.assertFalse(Group.objects.exists())
+
+
+class ExportCommandTests(TestCase):
+    def test_export_round_trip(self):
+        author = User.objects.create_user(username='author')
+        post = Post.objects.create(text='Сообщение', author=author)
+        post.comments.create(author=author, text='Комментарий')
+        path = os.path.join(TEMP_DIR, 'export.jsonl')
+        call_command('export_yatube', '--author=author', output=path,
+                     chunk_size=1)
+
+        Post.objects.all().delete()
+        call_command('import_yatube', path, restart=True, stdout=StringIO(),
+                     checkpoint=os.path.join(TEMP_DIR, 'export_checkpoint'))
+        imported = Post.objects.get(pk=post.pk)
+        self.assertEqual(imported.pub_date, post.pub_date)
+        self.assertEqual(imported.comments.get().text, 'Комментарий')
+
+    def test_export_csv_to_stdout(self):
+        User.objects.create_user(username='author')
+        out = StringIO()
+        call_command('export_yatube', '--author=author', format='csv',
+                     type='comment', stdout=out)
+        self.assertEqual(out.getvalue(), 'id,post,author,text,created\r\n')
@@ -1,7 +1,10 @@
-﻿from django.contrib.auth import get_user_model
+﻿from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
 
-from posts.models import Group, Post
+from posts.models import AuthorStats, Comment, Follow, Group, Post
 
 User = get_user_model()
 
@@ -67,3 +70,76 @@ class GroupModelTest(TestCase):
         for value, expected in texts.items():
             with self.subTest(value=value):
                 self.assertEquals(value, expected)
+
+
+class AuthorStatsModelTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def get_stats(self, user):
+        return AuthorStats.objects.get(user=user)
+
+    def test_counters_follow_posts_and_follows(self):
+        user = AuthorStatsModelTest.user
+        reader = AuthorStatsModelTest.reader
+
+        post = Post.objects.create(author=user, text='Первый')
+        Post.objects.create(author=user, text='Второй')
+        follow = Follow.objects.create(user=reader, author=user)
+        self.assertEqual(self.get_stats(user).posts_count, 2)
+        self.assertEqual(self.get_stats(user).followers_count, 1)
+        self.assertEqual(self.get_stats(reader).following_count, 1)
+
+        post.delete()
+        follow.delete()
+        self.assertEqual(self.get_stats(user).posts_count, 1)
+        self.assertEqual(self.get_stats(user).followers_count, 0)
+        self.assertEqual(self.get_stats(reader).following_count, 0)
+
+    def test_recount_stats_repairs_drift(self):
+        user = AuthorStatsModelTest.user
+
+        Post.objects.create(author=user, text='Первый')
+        AuthorStats.objects.filter(user=user).update(posts_count=10)
+        call_command('recount_stats', stdout=StringIO())
+        self.assertEqual(self.get_stats(user).posts_count, 1)
+
+
+class CommentsCountModelTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Сообщение')
+
+    def get_count(self):
+        post = Post.objects.get(pk=CommentsCountModelTest.post.pk)
+        return post.comments_count
+
+    def test_counter_follows_comments(self):
+        comment = Comment.objects.create(
+            post=CommentsCountModelTest.post,
+            author=CommentsCountModelTest.user,
+            text='Первый',
+        )
+        Comment.objects.create(
+            post=CommentsCountModelTest.post,
+            author=CommentsCountModelTest.user,
+            text='Второй',
+        )
+        self.assertEqual(self.get_count(), 2)
+        comment.delete()
+        self.assertEqual(self.get_count(), 1)
+
+    def test_recount_comments_repairs_drift(self):
+        Comment.objects.create(
+            post=CommentsCountModelTest.post,
+            author=CommentsCountModelTest.user,
+            text='Первый',
+        )
+        Post.objects.update(comments_count=10)
+        out = StringIO()
+        call_command('recount_comments', stdout=out)
+        self.assertEqual(self.get_count(), 1)
+        self.assertIn('Исправлено сообщений: 1', out.getvalue())
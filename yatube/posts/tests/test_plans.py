@@ -0,0 +1,90 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.paginator import encode_cursor
+from posts.models import Comment, Follow, Group, Post
+from posts.tests.utils import plan_problems, query_plan
+
+User = get_user_model()
+
+
+class QueryPlanTests(TestCase):
+    """Запросы лент читают индекс в нужном порядке, без сортировки."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for i in range(3):
+            cls.post = Post.objects.create(
+                text=f'Пост {i}', author=cls.author, group=cls.group
+            )
+            Comment.objects.create(
+                post=cls.post, author=cls.user, text=f'Комментарий {i}'
+            )
+        comment = Comment.objects.filter(post=cls.post).first()
+        cls.cursors = {
+            'post': encode_cursor(cls.post.pub_date, cls.post.pk),
+            'comment': encode_cursor(comment.created, comment.pk),
+        }
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(QueryPlanTests.user)
+
+    def feeds(self):
+        slug = {'slug': QueryPlanTests.group.slug}
+        username = {'username': QueryPlanTests.author.username}
+        post_id = {'post_id': QueryPlanTests.post.pk}
+        post = QueryPlanTests.cursors['post']
+        comment = QueryPlanTests.cursors['comment']
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs=slug),
+            reverse('posts:profile', kwargs=username),
+            reverse('posts:follow_index'),
+            reverse('api:index'),
+            reverse('api:group_list', kwargs=slug),
+            reverse('api:profile', kwargs=username),
+            reverse('api:follow_index'),
+        )
+        for url in urls:
+            yield url
+            yield f'{url}?after={post}'
+            yield f'{url}?before={post}'
+        yield reverse('posts:post_detail', kwargs=post_id)
+        yield reverse('posts:post_comments', kwargs=post_id)
+        yield reverse('posts:post_comments', kwargs=post_id) + (
+            f'?after={comment}'
+        )
+        yield reverse('posts:post_comments', kwargs=post_id) + (
+            f'?before={comment}'
+        )
+
+    def test_feed_queries_use_indexes(self):
+        for url in self.feeds():
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as context:
+                    response = self.client.get(url)
+                    if response.streaming:
+                        b''.join(response)
+                self.assertEqual(response.status_code, 200)
+                for query in context.captured_queries:
+                    if not query['sql'].startswith('SELECT'):
+                        continue
+                    plan = query_plan(query['sql'])
+                    self.assertEqual(
+                        plan_problems(plan), [],
+                        f'{query["sql"]}\n' + '\n'.join(plan)
+                    )
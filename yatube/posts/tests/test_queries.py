@@ -0,0 +1,128 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import urls
+from posts.models import Comment, Follow, Group, Post
+from posts.tests.utils import QUERY_BUDGETS, query_budget
+
+User = get_user_model()
+
+
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост',
+            author=cls.author,
+            group=cls.group,
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(QueryBudgetTests.user)
+
+    def grow(self):
+        author = QueryBudgetTests.author
+        cache.clear()
+        for i in range(settings.POSTS_LIMIT):
+            other = User.objects.create_user(username=f'user_{i}')
+            Post.objects.create(
+                text=f'Пост {i}',
+                author=author,
+                group=QueryBudgetTests.group,
+            )
+            Comment.objects.create(
+                post=QueryBudgetTests.post,
+                author=other,
+                text=f'Комментарий {i}',
+            )
+
+    def test_every_view_has_budget(self):
+        names = {f'posts:{pattern.name}' for pattern in urls.urlpatterns}
+        self.assertEqual(set(QUERY_BUDGETS), names)
+
+    @query_budget('posts:index', 3)
+    def test_index(self):
+        return self.client, reverse('posts:index')
+
+    @query_budget('posts:group_list', 5)
+    def test_group_list(self):
+        return self.client, reverse(
+            'posts:group_list', kwargs={'slug': QueryBudgetTests.group.slug}
+        )
+
+    @query_budget('posts:profile', 6)
+    def test_profile(self):
+        return self.client, reverse(
+            'posts:profile',
+            kwargs={'username': QueryBudgetTests.author.username}
+        )
+
+    @query_budget('posts:post_detail', 4)
+    def test_post_detail(self):
+        Comment.objects.get_or_create(
+            post=QueryBudgetTests.post,
+            author=QueryBudgetTests.user,
+            text='Первый комментарий',
+        )
+        return self.client, reverse(
+            'posts:post_detail', kwargs={'post_id': QueryBudgetTests.post.id}
+        )
+
+    @query_budget('posts:post_comments', 4)
+    def test_post_comments(self):
+        return self.client, reverse(
+            'posts:post_comments',
+            kwargs={'post_id': QueryBudgetTests.post.id}
+        )
+
+    @query_budget('posts:follow_index', 3)
+    def test_follow_index(self):
+        return self.client, reverse('posts:follow_index')
+
+    @query_budget('posts:post_create', 5)
+    def test_post_create(self):
+        return self.client, reverse('posts:post_create')
+
+    @query_budget('posts:post_edit', 4)
+    def test_post_edit(self):
+        self.client.force_login(QueryBudgetTests.author)
+        return self.client, reverse(
+            'posts:post_edit', kwargs={'post_id': QueryBudgetTests.post.id}
+        )
+
+    @query_budget('posts:add_comment', 3, method='post')
+    def test_add_comment(self):
+        return self.client, reverse(
+            'posts:add_comment', kwargs={'post_id': QueryBudgetTests.post.id}
+        )
+
+    @query_budget('posts:profile_follow', 13)
+    def test_profile_follow(self):
+        Follow.objects.filter(user=QueryBudgetTests.user).delete()
+        return self.client, reverse(
+            'posts:profile_follow',
+            kwargs={'username': QueryBudgetTests.author.username}
+        )
+
+    @query_budget('posts:profile_unfollow', 10)
+    def test_profile_unfollow(self):
+        Follow.objects.get_or_create(
+            user=QueryBudgetTests.user, author=QueryBudgetTests.author
+        )
+        return self.client, reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': QueryBudgetTests.author.username}
+        )
@@ -0,0 +1,133 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from sorl.thumbnail import get_thumbnail
+
+from posts import images, thumbnails
+from posts.models import Post
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+User = get_user_model()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def create_post(self, name='small.gif'):
+        return Post.objects.create(
+            text='Тест',
+            author=ThumbnailsTests.user,
+            image=SimpleUploadedFile(
+                name=name, content=SMALL_GIF, content_type='image/gif'
+            ),
+        )
+
+    def thumbnail_path(self, post):
+        geometry, options = next(images.variants())
+        thumbnail = get_thumbnail(post.image.name, geometry, **options)
+        return os.path.join(TEMP_MEDIA_ROOT, thumbnail.name)
+
+    def test_generate_creates_every_size(self):
+        post = self.create_post()
+        self.assertEqual(
+            thumbnails.generate(post.image.name),
+            len(list(images.variants()))
+        )
+        self.assertTrue(os.path.exists(self.thumbnail_path(post)))
+
+    def test_missing_source_is_skipped(self):
+        self.assertEqual(thumbnails.generate('posts/missing.gif'), 0)
+
+    def test_worker_skips_replaced_media_root(self):
+        post = self.create_post()
+        self.assertEqual(
+            thumbnails.generate_in_worker(post.image.name, '/elsewhere'), 0
+        )
+        self.assertEqual(
+            thumbnails.generate_in_worker(post.image.name, TEMP_MEDIA_ROOT),
+            len(list(images.variants()))
+        )
+
+    def test_backfill_resumes_from_checkpoint(self):
+        done = self.create_post('done.gif')
+        pending = self.create_post('pending.gif')
+        checkpoint = os.path.join(TEMP_MEDIA_ROOT, 'checkpoint')
+        with open(checkpoint, 'w') as file:
+            file.write(str(done.id))
+
+        out = StringIO()
+        call_command(
+            'generate_thumbnails', workers=1, checkpoint=checkpoint,
+            stdout=out
+        )
+        self.assertIn(
+            f'Готово превью: {len(list(images.variants()))}', out.getvalue()
+        )
+        self.assertFalse(os.path.exists(checkpoint))
+        self.assertTrue(os.path.exists(self.thumbnail_path(pending)))
+
+    def test_feed_renders_responsive_image(self):
+        post = self.create_post()
+        thumbnails.generate(post.image.name)
+        cache.clear()
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'loading="lazy"')
+        self.assertContains(response, 'width="960" height="339"')
+        for width in settings.POST_IMAGE_WIDTHS:
+            with self.subTest(width=width):
+                self.assertContains(response, f' {width}w')
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.id})
+        )
+        self.assertContains(response, 'srcset=')
+        self.assertNotContains(response, 'loading="lazy"')
+
+    def test_feed_does_not_generate_thumbnails(self):
+        post = self.create_post()
+        cache.clear()
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, f'src="{post.image.url}"')
+        self.assertNotContains(response, 'srcset=')
+        for geometry, options in images.variants():
+            with self.subTest(geometry=geometry, options=options):
+                self.assertIsNone(
+                    images.cached_thumbnail(post.image, geometry, **options)
+                )
+
+    def test_missing_image_renders_nothing(self):
+        Post.objects.create(
+            text='Тест',
+            author=ThumbnailsTests.user,
+            image='posts/missing.gif',
+        )
+        cache.clear()
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotContains(response, '<picture>')
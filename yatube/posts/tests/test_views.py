@@ -1,16 +1,24 @@
 ﻿import shutil
 import tempfile
 from http import HTTPStatus
+from io import StringIO
 
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.cache import cache
+from django.core.management import call_command
 from django import forms
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
 from django.conf import settings
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from posts.models import Group, Post, Comment, Follow
+from posts import conditional, feed_cache
+from posts.models import Group, Post, Comment, Follow, TimelineEntry
+from posts.tests.utils import capture_on_commit_callbacks
+from posts.viewer import Viewer
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -59,6 +67,7 @@ class PostPagesTests(TestCase):
         super().tearDownClass()
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.user = PostPagesTests.user
         self.authorized_client = Client()
@@ -212,6 +221,7 @@ class PaginatorViewsTest(TestCase):
             )
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.user = PaginatorViewsTest.user
         self.authorized_client = Client()
@@ -257,6 +267,44 @@ class PaginatorViewsTest(TestCase):
         )
         self.assertEqual(len(response.context['page_obj']), 3)
 
+    def test_index_cursor_pages(self):
+        first_page = self.client.get(reverse('posts:index')).context[
+            'page_obj'
+        ]
+        self.assertIsNone(first_page.previous_cursor)
+        response = self.client.get(
+            reverse('posts:index') + f'?after={first_page.next_cursor}'
+        )
+        second_page = response.context['page_obj']
+        self.assertEqual(len(second_page), 3)
+        self.assertIsNone(second_page.next_cursor)
+        self.assertEqual(second_page[0].text, '2')
+        response = self.client.get(
+            reverse('posts:index') + f'?before={second_page.previous_cursor}'
+        )
+        self.assertEqual(
+            list(response.context['page_obj']),
+            list(first_page),
+        )
+
+    def test_cursor_pages_do_not_count(self):
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    self.client.get(url)
+                self.assertFalse(any(
+                    'COUNT(' in query['sql'] for query in queries
+                ))
+
+    def test_broken_cursor_returns_first_page(self):
+        response = self.client.get(reverse('posts:index') + '?after=broken')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.context['page_obj'][0].text, '12')
+
 
 class CommentsViewsTests(TestCase):
     @classmethod
@@ -344,6 +392,58 @@ class CommentsViewsTests(TestCase):
             ).exists()
         )
 
+    def add_comments(self, count):
+        for i in range(count):
+            Comment.objects.create(
+                post=CommentsViewsTests.post,
+                author=self.user,
+                text=f'Комментарий {i}',
+            )
+
+    @override_settings(COMMENTS_LIMIT=3)
+    def test_comments_are_paginated(self):
+        self.add_comments(5)
+        cache.clear()
+        post = CommentsViewsTests.post
+        response = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.id})
+        )
+        first_page = response.context['comments_page']
+        self.assertEqual(len(first_page), 3)
+        self.assertContains(response, 'Комментарии: 5')
+
+        response = self.guest_client.get(
+            reverse('posts:post_comments', kwargs={'post_id': post.id}),
+            {'after': first_page.next_cursor},
+        )
+        self.assertTemplateUsed(response, 'posts/includes/comments_page.html')
+        self.assertNotContains(response, '<html')
+        self.assertEqual(len(response.context['comments_page']), 2)
+        self.assertIsNone(response.context['comments_page'].next_cursor)
+
+    def test_first_comments_page_is_cached(self):
+        self.add_comments(1)
+        cache.clear()
+        url = reverse(
+            'posts:post_detail', kwargs={'post_id': CommentsViewsTests.post.id}
+        )
+        self.guest_client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            self.guest_client.get(url)
+        self.assertFalse(any(
+            'posts_comment' in query['sql']
+            for query in context.captured_queries
+        ))
+
+        self.authorized_client.post(
+            reverse('posts:add_comment',
+                    kwargs={'post_id': CommentsViewsTests.post.id}),
+            data={'text': 'Свежий комментарий'},
+        )
+        response = self.guest_client.get(url)
+        self.assertContains(response, 'Свежий комментарий')
+        self.assertContains(response, 'Комментарии: 2')
+
 
 class CacheViewsTest(TestCase):
     @classmethod
@@ -369,29 +469,208 @@ class CacheViewsTest(TestCase):
         cls.authorized_client = Client()
         cls.authorized_client.force_login(cls.user)
 
+    def setUp(self):
+        cache.clear()
+
+    def get_index(self, query=''):
+        return CacheViewsTest.authorized_client.get(
+            reverse('posts:index') + query
+        ).content
+
     def test_cache_index(self):
-        response = CacheViewsTest.authorized_client.get(reverse('posts:index'))
-        posts = response.content
+        posts = self.get_index()
+
+        Post.objects.filter(pk=CacheViewsTest.post.pk).update(
+            text='Изменено в обход сигналов'
+        )
+        self.assertEqual(self.get_index(), posts, 'Страница не кешируется')
+        cache.clear()
+        self.assertNotEqual(self.get_index(), posts, 'Кеш не обновляется')
+
+    def test_cache_index_invalidated_by_new_post(self):
+        posts = self.get_index()
 
         Post.objects.create(
             text='Новое тестовое сообщение',
             author=CacheViewsTest.user,
         )
-        response_old = CacheViewsTest.authorized_client.get(
-            reverse('posts:index')
+        self.assertIn('Новое тестовое сообщение', self.get_index().decode())
+        self.assertNotEqual(self.get_index(), posts)
+
+    def test_cache_index_invalidated_by_group_and_user(self):
+        group = CacheViewsTest.group
+        user = CacheViewsTest.user
+        self.get_index()
+
+        group.title = 'Новое название группы'
+        group.save()
+        self.assertIn(group.title, self.get_index().decode())
+
+        user.first_name = 'Новое'
+        user.save()
+        self.assertIn(user.get_full_name(), self.get_index().decode())
+
+    def test_cache_key_depends_on_page(self):
+        for i in range(settings.POSTS_LIMIT):
+            Post.objects.create(
+                text=f'Сообщение {i}',
+                author=CacheViewsTest.user,
+            )
+        first_page = self.get_index()
+        self.assertNotEqual(self.get_index('?page=2'), first_page)
+
+    def test_cache_index_invalidated_by_comment(self):
+        self.get_index()
+
+        Comment.objects.create(
+            post=CacheViewsTest.post,
+            author=CacheViewsTest.user,
+            text='Комментарий',
         )
-        old_posts = response_old.content
-        self.assertEqual(
-            old_posts,
-            posts,
-            'Страница не кешируется'
+        self.assertIn('Комментариев:</b> 1', self.get_index().decode())
+
+    def test_versions_change_again_after_commit(self):
+        before = feed_cache.get_versions('index')
+        with capture_on_commit_callbacks() as callbacks:
+            Post.objects.create(
+                text='Новое тестовое сообщение',
+                author=CacheViewsTest.user,
+            )
+            during = feed_cache.get_versions('index')
+        self.assertNotEqual(during, before)
+        self.assertTrue(callbacks)
+        for callback in callbacks:
+            callback()
+        self.assertNotIn(
+            feed_cache.get_versions('index'), (before, during)
         )
+
+    def test_cache_group_invalidated_by_post(self):
+        group = CacheViewsTest.group
+        url = reverse('posts:group_list', kwargs={'slug': group.slug})
+        CacheViewsTest.authorized_client.get(url)
+
+        Post.objects.create(
+            text='Сообщение в группе',
+            author=CacheViewsTest.user,
+            group=group,
+        )
+        response = CacheViewsTest.authorized_client.get(url)
+        self.assertContains(response, 'Сообщение в группе')
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(
+            text='Тестовое сообщение',
+            author=cls.author,
+        )
+
+    def setUp(self):
         cache.clear()
-        response_new = CacheViewsTest.authorized_client.get(
-            reverse('posts:index')
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ConditionalGetTests.reader)
+
+    def revalidate(self, client, url):
+        etag = client.get(url)['ETag']
+        return client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_pages_return_304(self):
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            reverse(
+                'posts:post_detail',
+                kwargs={'post_id': ConditionalGetTests.post.id}
+            ),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.revalidate(self.guest_client, url)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+                self.assertIn('public', response['Cache-Control'])
+
+    def test_304_skips_rendering(self):
+        url = reverse('posts:index')
+        etag = self.guest_client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as context:
+            self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(len(context), 0)
+
+    def test_if_modified_since(self):
+        url = reverse('posts:index')
+        last_modified = self.guest_client.get(url)['Last-Modified']
+        response = self.guest_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_changes_invalidate_etag(self):
+        post = ConditionalGetTests.post
+        detail = reverse('posts:post_detail', kwargs={'post_id': post.id})
+        profile = reverse('posts:profile', kwargs={'username': 'author'})
+        changes = (
+            (reverse('posts:index'), lambda: Post.objects.create(
+                text='Новое сообщение', author=ConditionalGetTests.author
+            )),
+            (detail, lambda: Comment.objects.create(
+                post=post, author=ConditionalGetTests.reader, text='Ответ'
+            )),
+            (profile, lambda: Follow.objects.create(
+                user=ConditionalGetTests.reader,
+                author=ConditionalGetTests.author,
+            )),
+        )
+        for url, change in changes:
+            with self.subTest(url=url):
+                etag = self.authorized_client.get(url)['ETag']
+                change()
+                response = self.authorized_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_new_csrf_token_changes_etag(self):
+        url = reverse(
+            'posts:post_detail',
+            kwargs={'post_id': ConditionalGetTests.post.id},
+        )
+        client = self.authorized_client
+        client.get(url)
+        etag = client.get(url)['ETag']
+        # Новый вход меняет CSRF-токен, а с ним и форму комментария.
+        client.cookies[settings.CSRF_COOKIE_NAME] = 'a' * 32
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_scope_ids_are_cached(self):
+        group = Group.objects.create(title='Группа', slug='group')
+        self.assertEqual(
+            conditional.lookup_id(Group, 'slug', 'group'), group.pk
         )
-        new_posts = response_new.content
-        self.assertNotEqual(old_posts, new_posts, 'Кеш не обновляется')
+        with self.assertNumQueries(0):
+            conditional.lookup_id(Group, 'slug', 'group')
+        group.delete()
+        other = Group.objects.create(title='Другая', slug='group')
+        self.assertEqual(
+            conditional.lookup_id(Group, 'slug', 'group'), other.pk
+        )
+
+    def test_logged_in_pages_are_private(self):
+        url = reverse('posts:index')
+        guest = self.guest_client.get(url)
+        response = self.authorized_client.get(url)
+        self.assertNotEqual(response['ETag'], guest['ETag'])
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('no-cache', response['Cache-Control'])
+        response = self.authorized_client.get(
+            url, HTTP_IF_NONE_MATCH=guest['ETag']
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
 
 
 class FollowViewsTests(TestCase):
@@ -473,3 +752,260 @@ class FollowViewsTests(TestCase):
         self.authorized_client.force_login(user_3)
         response = self.authorized_client.get(reverse('posts:follow_index'))
         self.assertEquals(len(response.context['page_obj']), 0)
+
+    def test_timeline_follows_graph_changes(self):
+        user = FollowViewsTests.user
+        user_2 = FollowViewsTests.user_2
+
+        Follow.objects.create(user=user, author=user_2)
+        new_post = Post.objects.create(
+            text='Новое сообщение',
+            author=user_2,
+        )
+        self.assertEqual(
+            list(TimelineEntry.objects.filter(user=user).values_list(
+                'post', flat=True
+            )),
+            [new_post.id, FollowViewsTests.post_user_2.id]
+        )
+        client = Client()
+        client.force_login(user)
+        response = client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'][0], new_post)
+
+        Follow.objects.filter(user=user, author=user_2).delete()
+        self.assertFalse(TimelineEntry.objects.filter(user=user).exists())
+
+    def test_rebuild_timeline_command(self):
+        user = FollowViewsTests.user
+        user_2 = FollowViewsTests.user_2
+
+        Follow.objects.create(user=user, author=user_2)
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timeline', stdout=StringIO())
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=user,
+            post=FollowViewsTests.post_user_2
+        ).exists())
+
+
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовое сообщение', author=cls.user, group=cls.group
+        )
+        cls.urls = {
+            'index': reverse('posts:index'),
+            'group': reverse('posts:group_list', kwargs={'slug': 'test-slug'}),
+            'profile': reverse(
+                'posts:profile', kwargs={'username': 'author'}
+            ),
+            'post': reverse(
+                'posts:post_detail', kwargs={'post_id': cls.post.pk}
+            ),
+        }
+
+    def setUp(self):
+        cache.clear()
+
+    def assertCached(self, url, cached=True):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context is None, cached)
+        return response
+
+    def test_guest_pages_served_from_cache(self):
+        # id группы и профиля по slug и имени тоже берутся из кеша.
+        for url in AnonymousPageCacheTests.urls.values():
+            with self.subTest(url=url):
+                first = self.assertCached(url, cached=False)
+                with self.assertNumQueries(0):
+                    second = self.assertCached(url)
+                self.assertEqual(first.content, second.content)
+                self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_cached_page_answers_not_modified(self):
+        url = AnonymousPageCacheTests.urls['index']
+        etag = self.assertCached(url, cached=False)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_logged_in_users_skip_guest_pages(self):
+        url = AnonymousPageCacheTests.urls['index']
+        self.assertCached(url, cached=False)
+        self.client.force_login(AnonymousPageCacheTests.reader)
+        response = self.assertCached(url, cached=False)
+        self.assertContains(response, 'Выйти')
+
+    def rename_group(self):
+        group = AnonymousPageCacheTests.group
+        group.title = 'Другое название'
+        group.save()
+
+    def test_writes_invalidate_pages(self):
+        urls = AnonymousPageCacheTests.urls
+        post = AnonymousPageCacheTests.post
+        changes = {
+            'post': (
+                lambda: Post.objects.create(
+                    text='Новое', author=post.author, group=post.group
+                ),
+                ('index', 'group', 'profile'),
+            ),
+            'comment': (
+                lambda: Comment.objects.create(
+                    post=post, author=AnonymousPageCacheTests.reader,
+                    text='Комментарий',
+                ),
+                ('index', 'group', 'profile', 'post'),
+            ),
+            'follow': (
+                lambda: Follow.objects.create(
+                    user=AnonymousPageCacheTests.reader, author=post.author
+                ),
+                ('profile',),
+            ),
+            'group': (
+                self.rename_group, ('index', 'group', 'profile', 'post'),
+            ),
+        }
+        for name, (change, stale) in changes.items():
+            with self.subTest(change=name):
+                for url in urls.values():
+                    self.client.get(url)
+                change()
+                for page, url in urls.items():
+                    self.assertCached(url, cached=page not in stale)
+
+
+class UserPageCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.follower = User.objects.create_user(username='follower')
+        cls.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=cls.follower, author=cls.author)
+        cls.post = Post.objects.create(
+            text='Тестовое сообщение', author=cls.author
+        )
+        cls.profile_url = reverse(
+            'posts:profile', kwargs={'username': 'author'}
+        )
+        cls.post_url = reverse(
+            'posts:post_detail', kwargs={'post_id': cls.post.pk}
+        )
+        cls.templates = {
+            cls.profile_url: 'posts/profile.html',
+            cls.post_url: 'posts/post_detail.html',
+        }
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, user, url, cached):
+        client = Client()
+        client.force_login(user)
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        # Дырки рендерят свои шаблоны и при попадании в кеш.
+        rendered = [template.name for template in response.templates]
+        self.assertEqual(
+            UserPageCacheTests.templates[url] not in rendered, cached
+        )
+        self.assertNotContains(response, '<!--hole:')
+        self.assertContains(response, f'Пользователь: {user.username}')
+        return response
+
+    def test_follow_button_is_filled_per_user(self):
+        url = UserPageCacheTests.profile_url
+        follower = self.get(UserPageCacheTests.follower, url, cached=False)
+        reader = self.get(UserPageCacheTests.reader, url, cached=True)
+        self.assertContains(follower, 'Отписаться')
+        self.assertContains(reader, 'Подписаться')
+        self.assertNotEqual(follower['ETag'], reader['ETag'])
+
+    def test_edit_button_and_csrf_token_are_filled_per_user(self):
+        url = UserPageCacheTests.post_url
+        edit_url = reverse(
+            'posts:post_edit', kwargs={'post_id': UserPageCacheTests.post.pk}
+        )
+        reader = self.get(UserPageCacheTests.reader, url, cached=False)
+        author = self.get(UserPageCacheTests.author, url, cached=True)
+        self.assertNotContains(reader, edit_url)
+        self.assertContains(author, edit_url)
+        for response in (reader, author):
+            self.assertContains(response, 'csrfmiddlewaretoken')
+
+    def test_cached_page_answers_not_modified(self):
+        url = UserPageCacheTests.profile_url
+        self.get(UserPageCacheTests.follower, url, cached=False)
+        client = Client()
+        client.force_login(UserPageCacheTests.reader)
+        etag = client.get(url)['ETag']
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_follow_invalidates_viewer_etag(self):
+        url = UserPageCacheTests.profile_url
+        client = Client()
+        client.force_login(UserPageCacheTests.reader)
+        etag = client.get(url)['ETag']
+        Follow.objects.create(
+            user=UserPageCacheTests.reader, author=UserPageCacheTests.author
+        )
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Отписаться')
+
+
+class ViewerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author{number}')
+            for number in range(3)
+        ]
+        Follow.objects.create(user=cls.user, author=cls.authors[0])
+        Follow.objects.create(user=cls.user, author=cls.authors[1])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_following_ids_loaded_once_and_cached(self):
+        authors = ViewerTests.authors
+        viewer = Viewer(ViewerTests.user)
+        with self.assertNumQueries(1):
+            following = [viewer.follows(author.pk) for author in authors]
+            viewer.follows(authors[0].pk)
+        self.assertEqual(following, [True, True, False])
+        with self.assertNumQueries(0):
+            self.assertTrue(Viewer(ViewerTests.user).follows(authors[1].pk))
+
+    def test_follow_and_unfollow_invalidate_cache(self):
+        user = ViewerTests.user
+        authors = ViewerTests.authors
+        self.assertFalse(Viewer(user).follows(authors[2].pk))
+        Follow.objects.create(user=user, author=authors[2])
+        self.assertTrue(Viewer(user).follows(authors[2].pk))
+        Follow.objects.filter(user=user, author=authors[0]).delete()
+        self.assertFalse(Viewer(user).follows(authors[0].pk))
+
+    def test_anonymous_viewer(self):
+        viewer = Viewer(AnonymousUser())
+        with self.assertNumQueries(0):
+            self.assertFalse(viewer.follows(ViewerTests.authors[0].pk))
+            self.assertFalse(viewer.is_author(None))
+
+    def test_is_author(self):
+        viewer = Viewer(ViewerTests.user)
+        self.assertTrue(viewer.is_author(ViewerTests.user.pk))
+        self.assertFalse(viewer.is_author(ViewerTests.authors[0].pk))
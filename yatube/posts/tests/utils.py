@@ -0,0 +1,83 @@
+from contextlib import contextmanager
+from functools import wraps
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test.utils import CaptureQueriesContext
+
+QUERY_BUDGETS = {}
+
+
+def query_budget(view_name, queries, method='get'):
+    """Объявить бюджет SQL-запросов для view и проверить его в тесте.
+
+    Тест готовит данные и возвращает клиент и адрес запроса. Запрос
+    выполняется дважды: на исходных данных и после вызова `self.grow()`,
+    который добавляет строки в выдачу. Оба раза число запросов должно
+    уложиться в бюджет и не должно зависеть от числа строк на странице.
+    """
+    QUERY_BUDGETS[view_name] = queries
+
+    def decorator(test):
+        @wraps(test)
+        def wrapper(self, *args, **kwargs):
+            counts = []
+            for grow in (False, True):
+                if grow:
+                    self.grow()
+                client, url = test(self, *args, **kwargs)
+                with CaptureQueriesContext(connection) as context:
+                    getattr(client, method)(url)
+                counts.append(len(context))
+                self.assertLessEqual(
+                    len(context), queries,
+                    f'{view_name}: {len(context)} запросов при бюджете '
+                    f'{queries}:\n' + '\n'.join(
+                        query['sql'] for query in context.captured_queries
+                    )
+                )
+            self.assertEqual(
+                counts[0], counts[1],
+                f'{view_name}: число запросов растёт вместе с выдачей'
+            )
+        return wrapper
+    return decorator
+
+
+def query_plan(sql):
+    """Строки EXPLAIN QUERY PLAN для выполненного запроса SQLite."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def plan_problems(plan):
+    """Полный просмотр таблицы без индекса или сортировка во временном дереве.
+
+    SCAN по индексу допустим: так читается лента без фильтра, в порядке
+    индекса и с LIMIT.
+    """
+    return [
+        step for step in plan
+        if 'TEMP B-TREE' in step
+        or (step.startswith('SCAN ') and ' USING ' not in step)
+    ]
+
+
+@contextmanager
+def capture_on_commit_callbacks(using=DEFAULT_DB_ALIAS, execute=False):
+    """TestCase.captureOnCommitCallbacks из Django 3.2 для Django 2.2.
+
+    TestCase не фиксирует транзакцию, поэтому колбэки on_commit,
+    например смена версий лент, без этого в тестах не выполняются.
+    """
+    callbacks = []
+    start = len(connections[using].run_on_commit)
+    try:
+        yield callbacks
+    finally:
+        callbacks[:] = [
+            func for _, func in connections[using].run_on_commit[start:]
+        ]
+        if execute:
+            for callback in callbacks:
+                callback()
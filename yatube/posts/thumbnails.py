@@ -0,0 +1,60 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connections
+from sorl.thumbnail import get_thumbnail
+
+from posts import images
+
+logger = logging.getLogger(__name__)
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def generate(image):
+    """Создать все варианты картинки; вернуть число готовых."""
+    if not default_storage.exists(image):
+        return 0
+    ready = 0
+    for geometry, options in images.variants():
+        try:
+            if get_thumbnail(image, geometry, **options).exists():
+                ready += 1
+        except Exception:
+            logger.exception('Не удалось создать превью %s для %s',
+                             geometry, image)
+    return ready
+
+
+def generate_in_worker(image, media_root=None):
+    try:
+        # MEDIA_ROOT запоминается при постановке в очередь: если его
+        # успели сменить (override_settings в тестах), картинка уже
+        # в другом каталоге, и писать превью в новый нельзя.
+        if media_root is not None and media_root != settings.MEDIA_ROOT:
+            return 0
+        return generate(image)
+    finally:
+        # Потоки пула открывают собственные соединения с БД для kvstore.
+        connections.close_all()
+
+
+def schedule(post):
+    if not post.image:
+        return None
+    if not settings.THUMBNAIL_WORKERS:
+        return generate(post.image.name)
+    return get_executor().submit(
+        generate_in_worker, post.image.name, settings.MEDIA_ROOT
+    )
@@ -0,0 +1,72 @@
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import F
+
+from posts.models import Follow, Post, TimelineEntry
+
+BATCH_SIZE = 1000
+
+
+def get_timeline(user):
+    """Сообщения ленты подписок в порядке записей материализованной ленты."""
+    return Post.objects.filter(
+        timeline_entries__user=user
+    ).annotate(
+        feed_date=F('timeline_entries__pub_date'),
+        feed_post=F('timeline_entries__post'),
+    )
+
+
+def _insert(entries, batch_size=BATCH_SIZE):
+    entries = iter(entries)
+    batch = list(islice(entries, batch_size))
+    while batch:
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+        batch = list(islice(entries, batch_size))
+
+
+def fan_out_post(post):
+    followers = Follow.objects.filter(
+        author_id=post.author_id, user__isnull=False
+    ).values_list('user_id', flat=True)
+    _insert(
+        TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+        for user_id in followers.iterator()
+    )
+
+
+def add_author(user_id, author_id, batch_size=BATCH_SIZE):
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('id', 'pub_date')
+    _insert(
+        (
+            TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for post_id, pub_date in posts.iterator(chunk_size=batch_size)
+        ),
+        batch_size=batch_size,
+    )
+
+
+def remove_author(user_id, author_id):
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def rebuild(user_ids=None, batch_size=BATCH_SIZE):
+    """Пересобрать ленты подписок целиком; вернуть число подписок."""
+    follows = Follow.objects.filter(user__isnull=False, author__isnull=False)
+    entries = TimelineEntry.objects.all()
+    if user_ids is not None:
+        follows = follows.filter(user_id__in=user_ids)
+        entries = entries.filter(user_id__in=user_ids)
+    pairs = follows.values_list('user_id', 'author_id').order_by('user_id')
+    total = 0
+    with transaction.atomic():
+        entries.delete()
+        for user_id, author_id in pairs.iterator(chunk_size=batch_size):
+            add_author(user_id, author_id, batch_size=batch_size)
+            total += 1
+    return total
@@ -0,0 +1,18 @@
+from django.conf import settings
+
+from core.paginator import CursorPaginator
+
+
+def get_page(request, post_list, field='pub_date', pk_field='pk',
+             per_page=None):
+    paginator = CursorPaginator(
+        post_list,
+        per_page or settings.POSTS_LIMIT,
+        field=field,
+        pk_field=pk_field,
+    )
+    return paginator.get_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        number=request.GET.get('page'),
+    )
@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import cached_property
+
+from core.db_router import PRIMARY
+from posts import feed_cache
+from posts.models import Follow
+
+FOLLOWING_KEY = 'viewer_following:{}:{}'
+
+
+class Viewer:
+    """Кто смотрит страницу: подписки и авторство без запросов на карточку.
+
+    Множество id авторов, на которых подписан пользователь, читается
+    один раз за запрос и хранится в кеше под версией области
+    follow:<id>. Сигналы Follow меняют эту версию при подписке и отписке.
+    Множество читается из основной БД: отстающая реплика сохранила бы
+    под новой версией старые подписки.
+    """
+
+    def __init__(self, user):
+        self.user = user
+
+    @cached_property
+    def following_ids(self):
+        if not self.user.is_authenticated:
+            return frozenset()
+        key = FOLLOWING_KEY.format(
+            self.user.pk, feed_cache.get_versions(f'follow:{self.user.pk}')
+        )
+        following_ids = cache.get(key)
+        if following_ids is None:
+            following_ids = frozenset(Follow.objects.using(PRIMARY).filter(
+                user=self.user
+            ).values_list('author_id', flat=True))
+            cache.set(key, following_ids, settings.FEED_CACHE_TIMEOUT)
+        return following_ids
+
+    def follows(self, author_id):
+        return author_id in self.following_ids
+
+    def is_author(self, author_id):
+        return self.user.is_authenticated and self.user.pk == author_id
+
+
+def get_viewer(request):
+    if not hasattr(request, '_viewer'):
+        request._viewer = Viewer(request.user)
+    return request._viewer
@@ -1,80 +1,116 @@
-﻿from django.core.paginator import Paginator
+﻿from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
 from django.shortcuts import render, get_object_or_404, redirect
-from django.conf import settings
-from posts.models import Post, Group, User, Follow
+from django.utils.functional import SimpleLazyObject
+from posts.models import Comment, Post, Group, User, Follow
+from posts import conditional, thumbnails
+from posts.feed_cache import feed_cache_context
 from posts.forms import PostForm, CommentForm
+from posts.stats import get_stats
+from posts.timeline import get_timeline
+from posts.utils import get_page
 
 
+@conditional.conditional_page('posts:index', conditional.index_scopes)
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, settings.POSTS_LIMIT)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.select_related('author', 'group')
+    page_obj = get_page(request, post_list)
     context = {
         'page_obj': page_obj,
+        **feed_cache_context(request, 'index'),
     }
     return render(request, 'posts/index.html', context)
 
 
+@conditional.conditional_page('posts:group_list', conditional.group_scopes)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    paginator = Paginator(post_list, settings.POSTS_LIMIT)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = group.posts.select_related('author', 'group')
+    page_obj = get_page(request, post_list)
     context = {
         'page_obj': page_obj,
         'group': group,
         'title': str(group),
+        **feed_cache_context(request, f'group:{group.pk}'),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@conditional.conditional_page('posts:profile', conditional.profile_scopes)
 def profile(request, username):
-    profile = get_object_or_404(User, username=username)
-    post_list = profile.posts.all()
-    followers_count = profile.following.all().count()
-    following = request.user.is_authenticated and Follow.objects.filter(
-        user=request.user,
-        author=profile).exists()
-    paginator = Paginator(post_list, settings.POSTS_LIMIT)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    posts_count = post_list.count()
+    profile = get_object_or_404(
+        User.objects.select_related('stats'),
+        username=username
+    )
+    post_list = profile.posts.select_related('author', 'group')
+    stats = get_stats(profile)
+    page_obj = get_page(request, post_list)
     context = {
         'profile': profile,
         'page_obj': page_obj,
-        'paginator': paginator,
-        'posts_count': posts_count,
-        'followers_count': followers_count,
-        'following': following,
+        'posts_count': stats.posts_count,
+        'followers_count': stats.followers_count,
+        'following_count': stats.following_count,
+        **feed_cache_context(request, f'profile:{profile.pk}'),
     }
     return render(request, 'posts/profile.html', context)
 
 
+def get_comments_page(request, post_id):
+    comments = Comment.objects.filter(post_id=post_id).select_related('author')
+    return get_page(
+        request, comments, field='created', per_page=settings.COMMENTS_LIMIT
+    )
+
+
+@conditional.conditional_page('posts:post_detail', conditional.post_scopes)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'),
+        pk=post_id
+    )
     post_title = str(post)
     form = CommentForm()
-    comments = post.comments.all()
+    # Первая страница комментариев берётся из кеша фрагмента, поэтому
+    # запрос к БД выполняется, только если шаблон до неё дошёл.
+    comments_page = SimpleLazyObject(
+        lambda: get_comments_page(request, post_id)
+    )
+    first_page = not any(
+        name in request.GET for name in ('after', 'before', 'page')
+    )
     context = {
         'author': post.author,
         'post': post,
         'post_title': post_title,
-        'comments': comments,
+        'comments_page': comments_page,
+        'cache_comments': first_page,
         'form': form,
+        **feed_cache_context(request, f'post:{post.pk}'),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@conditional.conditional_page('posts:post_comments', conditional.post_scopes)
+def post_comments(request, post_id):
+    post = get_object_or_404(Post.objects.only('id'), pk=post_id)
+    context = {
+        'post': post,
+        'comments_page': get_comments_page(request, post_id),
+    }
+    return render(request, 'posts/includes/comments_page.html', context)
+
+
 @login_required
+@transaction.atomic
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        transaction.on_commit(lambda: thumbnails.schedule(post))
         return redirect('posts:profile', request.user.username)
     form = PostForm()
     context = {
@@ -87,7 +123,7 @@ def post_create(request):
 def post_edit(request, post_id):
     post = get_object_or_404(Post, id=post_id)
 
-    if request.user != post.author:
+    if request.user.id != post.author_id:
         return redirect('posts:post_detail', post_id)
 
     form = PostForm(request.POST or None,
@@ -95,7 +131,11 @@ def post_edit(request, post_id):
                     instance=post)
     if form.is_valid():
         post = form.save(commit=False)
-        post.save()
+        # Только поля формы: comments_count, прочитанный в начале запроса,
+        # затёр бы комментарии, добавленные за это время.
+        post.save(update_fields=PostForm.Meta.fields)
+        if 'image' in form.changed_data:
+            transaction.on_commit(lambda: thumbnails.schedule(post))
         return redirect('posts:post_detail', post_id)
     context = {
         'form': form,
@@ -119,21 +159,21 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
+    post_list = get_timeline(request.user).select_related('author', 'group')
 
-    paginator = Paginator(post_list, settings.POSTS_LIMIT)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = get_page(
+        request, post_list, field='feed_date', pk_field='feed_post'
+    )
 
     context = {
         'page_obj': page_obj,
-        'paginator': paginator,
     }
 
     return render(request, 'posts/follow.html', context)
 
 
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if author == request.user:
@@ -151,6 +191,7 @@ def profile_follow(request, username):
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     if author == request.user:
@@ -0,0 +1,234 @@
+import re
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from core.paginator import decode_cursor, encode_cursor
+from posts.models import Comment, Post
+
+BATCH_SIZE = 1000
+TERM_RE = re.compile(r'\w+')
+
+
+class BaseSearchBackend(ABC):
+    """Интерфейс поискового индекса по сообщениям и комментариям.
+
+    `search` возвращает до `limit` пар (post_id, score), начиная с
+    ближайших к курсору: меньший score — более релевантный результат.
+    Курсор `after` или `before` — пара (score, post_id); для `before`
+    пары идут в обратном порядке, от курсора к лучшим результатам.
+    """
+
+    @abstractmethod
+    def index_posts(self, posts):
+        """Добавить или обновить сообщения в индексе."""
+
+    @abstractmethod
+    def index_comments(self, comments):
+        """Добавить или обновить комментарии в индексе."""
+
+    @abstractmethod
+    def remove_post(self, post_id):
+        """Убрать сообщение из индекса."""
+
+    @abstractmethod
+    def remove_comment(self, comment_id):
+        """Убрать комментарий из индекса."""
+
+    @abstractmethod
+    def clear(self):
+        """Очистить индекс."""
+
+    def optimize(self):
+        """Сжать индекс; по умолчанию делать нечего."""
+
+    @abstractmethod
+    def search(self, query, after=None, before=None, limit=10):
+        """Вернуть список пар (post_id, score) для запроса."""
+
+
+class DatabaseSearchBackend(BaseSearchBackend):
+    """Поиск без индекса через LIKE; годится для любой СУБД."""
+
+    def index_posts(self, posts):
+        pass
+
+    def index_comments(self, comments):
+        pass
+
+    def remove_post(self, post_id):
+        pass
+
+    def remove_comment(self, comment_id):
+        pass
+
+    def clear(self):
+        pass
+
+    def search(self, query, after=None, before=None, limit=10):
+        condition = Q()
+        for term in TERM_RE.findall(query):
+            condition &= (
+                Q(text__icontains=term) | Q(comments__text__icontains=term)
+            )
+        if not condition:
+            return []
+        post_ids = Post.objects.filter(condition).values_list(
+            'id', flat=True
+        ).distinct()
+        if before is not None:
+            post_ids = post_ids.filter(id__lt=before[1]).order_by('-id')
+        else:
+            if after is not None:
+                post_ids = post_ids.filter(id__gt=after[1])
+            post_ids = post_ids.order_by('id')
+        return [(post_id, 0.0) for post_id in post_ids[:limit]]
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """Инвертированный индекс на виртуальных таблицах SQLite FTS5.
+
+    rowid в search_post совпадает с id сообщения, в search_comment — с id
+    комментария. Совпадения в комментариях весят меньше, чем в тексте
+    самого сообщения, и поднимают в выдаче сообщение, к которому оставлены.
+    """
+
+    comment_weight = 0.5
+
+    def _insert(self, table, rows):
+        rows = iter(rows)
+        batch = list(islice(rows, BATCH_SIZE))
+        with connection.cursor() as cursor:
+            while batch:
+                cursor.executemany(
+                    f'INSERT OR REPLACE INTO {table} '
+                    f'(rowid, text, post_id) VALUES (%s, %s, %s)',
+                    batch,
+                )
+                batch = list(islice(rows, BATCH_SIZE))
+
+    def _execute(self, sql, params=()):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def index_posts(self, posts):
+        self._insert('search_post', (
+            (post.id, post.text, post.id) for post in posts
+        ))
+
+    def index_comments(self, comments):
+        self._insert('search_comment', (
+            (comment.id, comment.text, comment.post_id)
+            for comment in comments
+        ))
+
+    def remove_post(self, post_id):
+        self._execute('DELETE FROM search_post WHERE rowid = %s', (post_id,))
+
+    def remove_comment(self, comment_id):
+        self._execute(
+            'DELETE FROM search_comment WHERE rowid = %s', (comment_id,)
+        )
+
+    def clear(self):
+        self._execute('DELETE FROM search_post')
+        self._execute('DELETE FROM search_comment')
+
+    def optimize(self):
+        for table in ('search_post', 'search_comment'):
+            self._execute(
+                f"INSERT INTO {table} ({table}) VALUES ('optimize')"
+            )
+
+    def match_expression(self, query):
+        # Пользовательский ввод не должен становиться синтаксисом FTS5:
+        # каждое слово берётся в кавычки и ищется как префикс.
+        return ' '.join(f'"{term}"*' for term in TERM_RE.findall(query))
+
+    def search(self, query, after=None, before=None, limit=10):
+        expression = self.match_expression(query)
+        if not expression:
+            return []
+        seek = ''
+        order = 'score, post_id'
+        params = [expression, self.comment_weight, expression]
+        cursor = after if after is not None else before
+        if cursor is not None:
+            sign = '>' if before is None else '<'
+            seek = (
+                f'HAVING MIN(relevance) {sign} %s '
+                f'OR (MIN(relevance) = %s AND post_id {sign} %s)'
+            )
+            params += [cursor[0], cursor[0], cursor[1]]
+        if before is not None:
+            order = 'score DESC, post_id DESC'
+        params.append(limit)
+        return self._execute(
+            'SELECT post_id, MIN(relevance) AS score FROM ('
+            '  SELECT rowid AS post_id, bm25(search_post) AS relevance'
+            '  FROM search_post WHERE search_post MATCH %s'
+            '  UNION ALL'
+            '  SELECT post_id, bm25(search_comment) * %s'
+            '  FROM search_comment WHERE search_comment MATCH %s'
+            f') GROUP BY post_id {seek} ORDER BY {order} LIMIT %s',
+            params,
+        )
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    return import_string(settings.SEARCH_BACKEND)()
+
+
+def reindex(batch_size=BATCH_SIZE):
+    """Перестроить индекс целиком; вернуть число сообщений и комментариев."""
+    backend = get_backend()
+    posts = Post.objects.only('id', 'text').order_by()
+    comments = Comment.objects.only('id', 'text', 'post_id').order_by()
+    # Одна транзакция вместо фиксации каждой вставленной строки.
+    with transaction.atomic():
+        backend.clear()
+        backend.index_posts(posts.iterator(chunk_size=batch_size))
+        backend.index_comments(comments.iterator(chunk_size=batch_size))
+    backend.optimize()
+    return posts.count(), comments.count()
+
+
+class SearchPage(list):
+    """Страница выдачи с курсорами соседних страниц."""
+
+    next_cursor = None
+    previous_cursor = None
+
+
+def search_page(query, after=None, before=None, per_page=None):
+    per_page = per_page or settings.POSTS_LIMIT
+    after = decode_cursor(after, parse=float)
+    before = None if after else decode_cursor(before, parse=float)
+    rows = get_backend().search(
+        query, after=after, before=before, limit=per_page + 1
+    )
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if before is not None:
+        rows.reverse()
+        has_better, has_worse = has_more, bool(rows)
+    else:
+        has_better, has_worse = after is not None, has_more
+    posts = Post.objects.select_related('author', 'group').in_bulk(
+        [post_id for post_id, _ in rows]
+    )
+    page = SearchPage(
+        posts[post_id] for post_id, _ in rows if post_id in posts
+    )
+    if rows and has_worse:
+        page.next_cursor = encode_cursor(rows[-1][1], rows[-1][0])
+    if rows and has_better:
+        page.previous_cursor = encode_cursor(rows[0][1], rows[0][0])
+    return page
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from search.backends import BATCH_SIZE, reindex
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает поисковый индекс сообщений и комментариев'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        posts, comments = reindex(batch_size=options['batch_size'])
+        self.stdout.write(
+            f'Проиндексировано сообщений: {posts}, комментариев: {comments} '
+            f'за {time.monotonic() - started:.1f} с'
+        )
@@ -0,0 +1,53 @@
+from django.db import migrations
+
+TABLES = ('search_post', 'search_comment')
+
+
+def create_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table in TABLES:
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5('
+            f"text, post_id UNINDEXED, tokenize='unicode61 remove_diacritics 2')"
+        )
+
+
+def drop_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table in TABLES:
+        schema_editor.execute(f'DROP TABLE IF EXISTS {table}')
+
+
+def fill_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            'INSERT INTO search_post (rowid, text, post_id) '
+            'VALUES (%s, %s, %s)',
+            [(pk, text, pk) for pk, text in
+             Post.objects.values_list('id', 'text').iterator()],
+        )
+        cursor.executemany(
+            'INSERT INTO search_comment (rowid, text, post_id) '
+            'VALUES (%s, %s, %s)',
+            list(Comment.objects.values_list(
+                'id', 'text', 'post_id'
+            ).iterator()),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_authorstats'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_tables, drop_tables),
+        migrations.RunPython(fill_tables, migrations.RunPython.noop),
+    ]
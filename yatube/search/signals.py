@@ -0,0 +1,27 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from posts.models import Comment, Post
+from search.backends import get_backend
+
+
+@receiver(post_save, sender=Post)
+def post_indexed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        get_backend().index_posts([instance])
+
+
+@receiver(post_delete, sender=Post)
+def post_unindexed(sender, instance, **kwargs):
+    get_backend().remove_post(instance.id)
+
+
+@receiver(post_save, sender=Comment)
+def comment_indexed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        get_backend().index_comments([instance])
+
+
+@receiver(post_delete, sender=Comment)
+def comment_unindexed(sender, instance, **kwargs):
+    get_backend().remove_comment(instance.id)
@@ -0,0 +1,99 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Post
+from search.backends import get_backend, search_page
+
+User = get_user_model()
+
+
+class SearchViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Пишу про котиков и собак',
+        )
+        cls.other_post = Post.objects.create(
+            author=cls.user,
+            text='Совсем другая тема',
+        )
+
+    def search(self, query, **params):
+        response = self.client.get(
+            reverse('search:search'), {'q': query, **params}
+        )
+        return response.context['page_obj']
+
+    def test_search_finds_post_by_word_prefix(self):
+        self.assertEqual(self.search('котик'), [SearchViewTests.post])
+        self.assertEqual(self.search('КОТИКОВ собак'), [SearchViewTests.post])
+
+    def test_search_by_comment(self):
+        Comment.objects.create(
+            post=SearchViewTests.other_post,
+            author=SearchViewTests.user,
+            text='А где котики?',
+        )
+        self.assertEqual(
+            self.search('котик'),
+            [SearchViewTests.post, SearchViewTests.other_post]
+        )
+
+    def test_deleted_post_leaves_index(self):
+        Post.objects.filter(pk=SearchViewTests.post.pk).delete()
+        self.assertEqual(self.search('котиков'), [])
+
+    def test_query_syntax_is_escaped(self):
+        self.assertEqual(self.search('"котиков* ('), [SearchViewTests.post])
+        self.assertEqual(self.search('котиков NEAR('), [])
+
+    def test_cursor_pages(self):
+        posts = [
+            Post.objects.create(author=SearchViewTests.user, text='ёжик')
+            for _ in range(3)
+        ]
+        with self.settings(POSTS_LIMIT=2):
+            first_page = self.search('ёжик')
+            second_page = self.search('ёжик', after=first_page.next_cursor)
+            back = self.search('ёжик', before=second_page.previous_cursor)
+        self.assertEqual(len(first_page), 2)
+        self.assertEqual(len(second_page), 1)
+        self.assertIsNone(second_page.next_cursor)
+        self.assertCountEqual(first_page + second_page, posts)
+        self.assertEqual(back, first_page)
+
+    def test_reindex_command(self):
+        get_backend().clear()
+        self.assertEqual(self.search('котиков'), [])
+        call_command('reindex_search', stdout=StringIO())
+        self.assertEqual(self.search('котиков'), [SearchViewTests.post])
+
+
+@override_settings(SEARCH_BACKEND='search.backends.DatabaseSearchBackend')
+class DatabaseSearchBackendTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Про котиков')
+        Comment.objects.create(
+            post=Post.objects.create(author=cls.user, text='Другое'),
+            author=cls.user,
+            text='Тоже про котиков',
+        )
+
+    def setUp(self):
+        get_backend.cache_clear()
+
+    def tearDown(self):
+        get_backend.cache_clear()
+
+    def test_search_without_index(self):
+        page = search_page('котик', per_page=1)
+        self.assertEqual(page, [DatabaseSearchBackendTests.post])
+        self.assertEqual(len(search_page('котик', after=page.next_cursor)), 1)
@@ -0,0 +1,22 @@
+from urllib.parse import urlencode
+
+from django.shortcuts import render
+
+from search.backends import search_page
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = None
+    if query:
+        page_obj = search_page(
+            query,
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+        )
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'search/results.html', context)
@@ -0,0 +1,12 @@
+// Кнопка «Показать ещё» подгружает следующую страницу комментариев
+// фрагментом HTML; без JavaScript ссылка открывает её целиком.
+document.addEventListener('click', function (event) {
+  var button = event.target.closest('[data-load-more]');
+  if (!button) {
+    return;
+  }
+  event.preventDefault();
+  fetch(button.dataset.url)
+    .then(function (response) { return response.text(); })
+    .then(function (html) { button.outerHTML = html; });
+});
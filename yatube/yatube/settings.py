@@ -10,7 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
+import atexit
 import os
+import shutil
+import sys
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -25,6 +29,15 @@ SECRET_KEY = '7-1imoa@ef#-0=u^^ye!6jl#x2_otn8$whpv3o@4$(jo2-!521'
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
 
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+# Файлы кеша, метрик и профилей тестов живут во временном каталоге:
+# тесты не видят данных разработки и не оставляют файлов в дереве
+if TESTING:
+    RUNTIME_DIR = tempfile.mkdtemp(prefix='yatube-tests-')
+    atexit.register(shutil.rmtree, RUNTIME_DIR, ignore_errors=True)
+else:
+    RUNTIME_DIR = BASE_DIR
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 ALLOWED_HOSTS = [
@@ -47,15 +60,22 @@ INSTALLED_APPS = [
     'posts.apps.PostsConfig',
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
+    'search.apps.SearchConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'posts.middleware.AnonymousPageCacheMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ProfilerMiddleware',
+    'core.middleware.ReplicaMiddleware',
+    'posts.middleware.UserPageCacheMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -67,7 +87,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.metrics.DjangoTemplates',
         # Добавлено: Искать шаблоны на уровне проекта
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
@@ -93,7 +113,40 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+        # Соединение живёт между запросами, а не открывается на каждый
+        'CONN_MAX_AGE': 600,
+    },
+    # Реплика только для чтения; локально — копия файла, см. sync_replicas:
+    # 'replica': {
+    #     'ENGINE': 'django.db.backends.sqlite3',
+    #     'NAME': os.path.join(BASE_DIR, 'db_replica.sqlite3'),
+    #     'TEST': {'MIRROR': 'default'},
+    # },
+}
+
+# Все базы, кроме основной, — реплики. Чтение GET-страниц REPLICA_VIEWS
+# идёт на них, кроме REPLICA_PIN_SECONDS после записи клиента
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+REPLICA_VIEWS = (
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:follow_index',
+)
+REPLICA_PIN_SECONDS = 5
+
+# Выполняются на каждом новом соединении SQLite (core.signals). WAL
+# позволяет читать во время записи, synchronous=NORMAL в WAL не теряет
+# целостность, cache_size в КиБ со знаком минус, mmap_size в байтах
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'cache_size': -64000,
+    'mmap_size': 268435456,
+    'busy_timeout': 5000,
+    'temp_store': 'memory',
 }
 
 
@@ -130,6 +183,33 @@ USE_L10N = True
 USE_TZ = True
 
 POSTS_LIMIT = 10
+COMMENTS_LIMIT = 20
+
+# Фрагменты лент сбрасываются сигналами, поэтому живут долго
+FEED_CACHE_TIMEOUT = 60 * 60 * 24
+# Страницы лент целиком: для гостей и с дырками для вошедших;
+# устаревают вместе с версиями лент
+PAGE_CACHE_TIMEOUT = 60 * 60
+
+# Cache-Control страниц с условным GET: гостям ответ public и живёт
+# max-age секунд, вошедшим — private и проверяется при каждом запросе
+PAGE_MAX_AGE = {
+    'posts:index': 30,
+    'posts:group_list': 30,
+    'posts:profile': 30,
+    'posts:post_detail': 10,
+    'posts:post_comments': 10,
+    'api:index': 30,
+    'api:group_list': 30,
+    'api:profile': 30,
+    'api:follow_index': 0,
+}
+
+# Наибольший размер страницы API, параметр limit
+API_MAX_LIMIT = 100
+
+# Полнотекстовый поиск; для СУБД без FTS5 — search.backends.DatabaseSearchBackend
+SEARCH_BACKEND = 'search.backends.SQLiteFTSBackend'
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/2.2/howto/static-files/
@@ -140,12 +220,41 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Варианты картинки сообщения для srcset: ширины в пикселях при
+# пропорциях POST_IMAGE_RATIO, в JPEG и, если Pillow умеет, в WebP.
+# Все варианты создаются заранее в фоновом пуле после сохранения,
+# а при THUMBNAIL_WORKERS = 0 — сразу в запросе. Тесты удаляют
+# временный MEDIA_ROOT сразу после запроса, поэтому в них пул
+# не используется
+POST_IMAGE_WIDTHS = (480, 960, 1440)
+POST_IMAGE_RATIO = (960, 339)
+POST_IMAGE_DEFAULT_WIDTH = 960
+THUMBNAIL_WORKERS = 0 if TESTING else 2
+
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 # LOGOUT_REDIRECT_URL = 'posts:index'
 
+# Общий для всех процессов на машине кеш в файле SQLite
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.path.join(RUNTIME_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
     }
 }
+
+# Метрики для /metrics: процессы копят их в памяти и раз в
+# METRICS_FLUSH_INTERVAL секунд прибавляют к общему файлу SQLite
+METRICS_LOCATION = os.path.join(RUNTIME_DIR, 'metrics.sqlite3')
+METRICS_FLUSH_INTERVAL = 10
+METRICS_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+
+# Профили запросов сотрудников (?profile): хранятся последние PROFILE_KEEP
+PROFILE_DIR = os.path.join(RUNTIME_DIR, 'profiles')
+PROFILE_KEEP = 50
+PROFILE_TOP = 40